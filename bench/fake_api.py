@@ -0,0 +1,145 @@
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from aiohttp import web
+
+# Methods Telegram rate-limits; only these get injected 429s
+_LIMITED_PREFIXES = ("send", "copyMessage", "forwardMessage", "editMessage")
+
+
+class FakeBotAPI:
+    """Local stand-in for api.telegram.org used by the load benchmark.
+
+    Answers every Bot API method the bot uses with a minimal valid result,
+    counts calls per method, adds `latency` (+/- `jitter`) seconds to each
+    call, and answers a `rate_limit` fraction of send-type calls with a 429
+    carrying `retry_after`. Updates put on `updates` are served through
+    getUpdates, which is how sharded mode is driven.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, rate_limit: float = 0.0,
+                 retry_after: int = 1, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.calls: Counter = Counter()
+        self.rate_limited: Counter = Counter()
+        self.updates: List[dict] = []
+        self.served_updates = 0
+        self.first_update_served: Optional[float] = None
+        self.last_call: float = 0.0
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route("*", "/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _params(self, request: web.Request) -> Dict[str, Any]:
+        params: Dict[str, Any] = dict(request.query)
+        if request.can_read_body:
+            if request.content_type == "application/json":
+                params.update(await request.json())
+            else:
+                form = await request.post()
+                for key, value in form.items():
+                    params[key] = value if isinstance(value, str) else "<file>"
+        return params
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await self._params(request)
+        if method == "getUpdates":
+            return web.json_response({"ok": True, "result": await self._get_updates(params)})
+
+        self.calls[method] += 1
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter)))
+        self.last_call = time.monotonic()
+        if self.rate_limit and method.startswith(_LIMITED_PREFIXES) and self._random.random() < self.rate_limit:
+            self.rate_limited[method] += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+        return web.json_response({"ok": True, "result": self._result(method, params)})
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[dict]:
+        offset = int(params.get("offset") or 0)
+        pending = [u for u in self.updates if u["update_id"] >= offset][:100]
+        if not pending:
+            # Long poll briefly so the client does not spin
+            await asyncio.sleep(0.2)
+            return []
+        if self.first_update_served is None:
+            self.first_update_served = time.monotonic()
+        # Drop everything the client has confirmed via offset
+        self.updates = [u for u in self.updates if u["update_id"] >= offset]
+        self.served_updates = max(self.served_updates, pending[-1]["update_id"])
+        return pending
+
+    def _chat(self, chat_id: Any) -> dict:
+        try:
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            chat_id = -1
+        return {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup", "first_name": "Bench"}
+
+    def _message(self, params: Dict[str, Any]) -> dict:
+        message = {"message_id": next(self._ids), "date": int(time.time()), "chat": self._chat(params.get("chat_id"))}
+        if "text" in params:
+            message["text"] = params["text"]
+        if params.get("message_thread_id"):
+            message["message_thread_id"] = int(params["message_thread_id"])
+        return message
+
+    def _invite_link(self, params: Dict[str, Any]) -> dict:
+        link = params.get("invite_link") or f"https://t.me/+bench{next(self._ids)}"
+        return {
+            "invite_link": link,
+            "creator": {"id": 1, "is_bot": True, "first_name": "Bench"},
+            "creates_join_request": str(params.get("creates_join_request", "")).lower() in ("true", "1"),
+            "is_primary": False,
+            "is_revoked": False,
+            "name": params.get("name"),
+        }
+
+    def _result(self, method: str, params: Dict[str, Any]) -> Any:
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        if method == "copyMessage":
+            return {"message_id": next(self._ids)}
+        if method == "copyMessages":
+            ids = params.get("message_ids") or "[]"
+            return [{"message_id": next(self._ids)} for _ in (json.loads(ids) if isinstance(ids, str) else ids)]
+        if method == "sendMediaGroup":
+            media = params.get("media") or "[]"
+            count = len(json.loads(media)) if isinstance(media, str) else len(media)
+            return [self._message(params) for _ in range(max(1, count))]
+        if method.startswith("send") or method in ("forwardMessage", "editMessageText"):
+            return self._message(params)
+        if method == "createForumTopic":
+            return {"message_thread_id": next(self._ids), "name": params.get("name", "topic"), "icon_color": 7322096}
+        if method in ("createChatInviteLink", "editChatInviteLink"):
+            return self._invite_link(params)
+        return True
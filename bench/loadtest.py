@@ -0,0 +1,384 @@
+"""Load benchmark: replays a synthetic update stream through the real routers.
+
+Updates are generated at configurable ratios and fed to the dispatcher
+(dp.feed_update) against bench/fake_api.py, a local Bot API stand-in with
+injectable latency and 429s. Reports throughput, p50/p99 handler latency and
+Bot API / repository call counts per update type.
+
+    python -m bench.loadtest                                  # 5000 updates, default mix
+    python -m bench.loadtest -n 20000 --mix start=1,stats=5,join=4 --api-latency 0.05
+    python -m bench.loadtest --rate-limit 0.02 --json before.json
+    python -m bench.loadtest --shards 4                       # sharded mode (throughput only)
+
+Outbound pacing is lifted by default so the numbers measure the bot rather
+than Telegram's limits; pass --real-limits to keep the configured rates.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from bench.fake_api import FakeBotAPI
+
+KINDS = ("start", "stats", "media", "album", "staff_reply", "join")
+DEFAULT_MIX = "start=3,stats=4,media=2,album=1,staff_reply=1,join=2"
+ALLOWED_UPDATES = ["message", "callback_query", "chat_join_request"]
+
+CHANNEL_ID = -1001000000001
+STAFF_CHAT_ID = -1001000000002
+STAFF_MEMBER_ID = 42
+USER_BASE = 10_000_000
+JOINER_BASE = 50_000_000
+TOPIC_BASE = 500_000
+
+# Update type being handled, for attributing API and DB calls
+_current_kind: ContextVar[Optional[str]] = ContextVar("bench_kind", default=None)
+
+
+def _bench_env(args: argparse.Namespace) -> None:
+    # Applied before any bot module (and so config) is imported; spawned shard
+    # workers inherit it
+    env = {
+        "BOT_TOKEN": "123456:bench",
+        "CHANNEL_ID": str(CHANNEL_ID),
+        "STAFF_CHAT_ID": str(STAFF_CHAT_ID),
+        "JOIN_REQUESTS_ENABLED": "yes",
+        "INVITE_POOL_HIGH": "0",
+        "JOIN_DIGEST_INTERVAL": "3600",
+        "METRICS_PORT": "0",
+        "WEBHOOK_URL": "",
+        "DEBUG": "false",
+    }
+    if not args.real_limits:
+        env.update({"SEND_GLOBAL_RATE": "1000000", "SEND_PRIVATE_RATE": "1000000",
+                    "SEND_GROUP_PER_MINUTE": "60000000"})
+    os.environ.update(env)
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise argparse.ArgumentTypeError(f"unknown update type {kind!r} (one of {', '.join(KINDS)})")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def _user(uid: int) -> dict:
+    return {"id": uid, "is_bot": False, "first_name": f"User{uid}", "username": f"user{uid}"}
+
+
+def _private_message(update_id: int, uid: int, **fields) -> dict:
+    message = {"message_id": update_id, "date": 0, "chat": {"id": uid, "type": "private"}, "from": _user(uid)}
+    message.update(fields)
+    return {"update_id": update_id, "message": message}
+
+
+def generate_updates(n: int, mix: Dict[str, float], users: int, join_burst: int, album_size: int = 10,
+                     seed: int = 0) -> List[Tuple[str, dict]]:
+    """n (type, raw update) pairs; join requests arrive in bursts of join_burst, albums as album_size photos."""
+    rnd = random.Random(seed)
+    kinds = list(mix)
+    weights = [mix[k] for k in kinds]
+    joiner = JOINER_BASE
+    out: List[Tuple[str, dict]] = []
+    while len(out) < n:
+        kind = rnd.choices(kinds, weights)[0]
+        uid = USER_BASE + rnd.randrange(users)
+        update_id = len(out) + 1
+        if kind == "start":
+            out.append((kind, _private_message(update_id, uid, text="/start",
+                                               entities=[{"type": "bot_command", "offset": 0, "length": 6}])))
+        elif kind == "stats":
+            out.append((kind, _private_message(update_id, uid, text="My Stats")))
+        elif kind == "media":
+            photo = [{"file_id": f"photo{update_id}", "file_unique_id": f"u{update_id}", "width": 90, "height": 90}]
+            out.append((kind, _private_message(update_id, uid, photo=photo, caption="screenshot")))
+        elif kind == "album":
+            # A screenshot album: album_size photo updates sharing a media_group_id
+            group_id = f"album{update_id}"
+            for _ in range(min(album_size, n - len(out))):
+                update_id = len(out) + 1
+                photo = [{"file_id": f"photo{update_id}", "file_unique_id": f"u{update_id}", "width": 90, "height": 90}]
+                out.append((kind, _private_message(update_id, uid, photo=photo, media_group_id=group_id)))
+        elif kind == "staff_reply":
+            out.append((kind, {"update_id": update_id, "message": {
+                "message_id": update_id, "date": 0,
+                "chat": {"id": STAFF_CHAT_ID, "type": "supergroup", "title": "Staff", "is_forum": True},
+                "from": {"id": STAFF_MEMBER_ID, "is_bot": False, "first_name": "Staff"},
+                "message_thread_id": TOPIC_BASE + (uid - USER_BASE), "is_topic_message": True,
+                "text": "Thanks, we got it!",
+            }}))
+        else:
+            # A burst of new members arriving through one referrer's link
+            for _ in range(min(join_burst, n - len(out))):
+                joiner += 1
+                out.append(("join", {"update_id": len(out) + 1, "chat_join_request": {
+                    "chat": {"id": CHANNEL_ID, "type": "channel", "title": "Channel"},
+                    "from": _user(joiner), "user_chat_id": joiner, "date": 0,
+                    "invite_link": {
+                        "invite_link": f"https://t.me/+ref{uid}", "name": f"user_{uid}",
+                        "creator": {"id": 1, "is_bot": True, "first_name": "Bench"},
+                        "creates_join_request": True, "is_primary": False, "is_revoked": False,
+                    },
+                }}))
+    return out
+
+
+async def seed_db(users: int, seeded: float) -> None:
+    """Users, staff topics for all of them and invite links for a `seeded` fraction."""
+    from db.connection import writer
+    async with writer() as conn:
+        await conn.executemany("INSERT OR IGNORE INTO users (tg_user_id, username, first_name) VALUES (?, ?, ?)",
+                               [(USER_BASE + i, f"user{USER_BASE + i}", f"User{USER_BASE + i}") for i in range(users)])
+        await conn.executemany("INSERT OR IGNORE INTO user_topics (tg_user_id, topic_id, topic_name) VALUES (?, ?, ?)",
+                               [(USER_BASE + i, TOPIC_BASE + i, f"User{i}") for i in range(users)])
+        await conn.executemany("INSERT OR IGNORE INTO invite_links (invite_link, tg_user_id, active) VALUES (?, ?, 1)",
+                               [(f"https://t.me/+ref{USER_BASE + i}", USER_BASE + i) for i in range(int(users * seeded))])
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def run_local(updates: List[Tuple[str, dict]], args: argparse.Namespace, api: FakeBotAPI) -> dict:
+    from aiogram import Bot, Dispatcher
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+    from aiogram.client.telegram import TelegramAPIServer
+    from aiogram.types import Update
+    from config import config
+    from db.connection import open_db, close_db
+    from db.repository import init_db, load_caches, flush_pending_users
+    from handlers import router as handlers_router
+    from services import sender
+    from services.join_digest import join_digest
+    from services.media_groups import media_groups
+    from services.join_pipeline import join_pipeline
+    from utils.metrics import registry
+
+    api_calls: Dict[str, Counter] = defaultdict(Counter)
+    db_calls: Dict[str, Counter] = defaultdict(Counter)
+
+    class AttributeApiCalls(BaseRequestMiddleware):
+        async def __call__(self, make_request, bot, method):
+            api_calls[_current_kind.get() or "background"][method.__api_method__] += 1
+            return await make_request(bot, method)
+
+    # Attribute repository calls (timed in db/repository.py) to the update type
+    db_histogram = registry.histogram("bot_db_call_seconds", "")
+    observe = db_histogram.observe
+
+    def attributed_observe(function: str, seconds: float) -> None:
+        observe(function, seconds)
+        db_calls[_current_kind.get() or "background"][function] += 1
+    db_histogram.observe = attributed_observe
+
+    bot = Bot(token=config.BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(api.base_url)))
+    sender.install(bot)
+    bot.session.middleware(AttributeApiCalls())
+    dp = Dispatcher()
+    dp.include_router(handlers_router)
+
+    await open_db(config.DB_READERS)
+    await init_db()
+    await seed_db(args.users, args.seeded)
+    await load_caches()
+    await join_pipeline.start(bot)
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Counter = Counter()
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def handle(kind: str, raw: dict) -> None:
+        _current_kind.set(kind)
+        start = time.perf_counter()
+        try:
+            await dp.feed_update(bot, Update.model_validate(raw, context={"bot": bot}))
+        except Exception:
+            errors[kind] += 1
+        finally:
+            latencies[kind].append(time.perf_counter() - start)
+            slots.release()
+
+    tasks = []
+    started = time.perf_counter()
+    for kind, raw in updates:
+        await slots.acquire()
+        tasks.append(asyncio.create_task(handle(kind, raw)))
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - started
+
+    # Let buffered albums and the background join recorder catch up, then shut down cleanly
+    await media_groups.flush()
+    await join_pipeline.drain()
+    await join_pipeline.stop()
+    # Anything spooled was not recorded, and its DB calls would be missing from the report
+    assert join_pipeline.spooled == 0, f"{join_pipeline.spooled} joins were spooled instead of recorded"
+    await join_digest.flush()
+    await flush_pending_users()
+    drained = time.perf_counter() - started
+    await close_db()
+    await bot.session.close()
+    db_histogram.observe = observe
+
+    counts = Counter(kind for kind, _ in updates)
+    per_kind = {}
+    for kind in sorted(counts, key=KINDS.index):
+        values = sorted(latencies[kind])
+        per_kind[kind] = {
+            "updates": counts[kind],
+            "errors": errors[kind],
+            "p50_ms": round(_percentile(values, 0.50) * 1000, 3),
+            "p99_ms": round(_percentile(values, 0.99) * 1000, 3),
+            "api_calls": dict(api_calls[kind]),
+            "db_calls": dict(db_calls[kind]),
+        }
+    return {
+        "mode": "local",
+        "updates": len(updates),
+        "wall_s": round(wall, 3),
+        "drained_s": round(drained, 3),
+        "throughput_per_s": round(len(updates) / wall, 1),
+        "per_kind": per_kind,
+        "background": {"api_calls": dict(api_calls["background"]), "db_calls": dict(db_calls["background"])},
+    }
+
+
+async def run_shards(updates: List[Tuple[str, dict]], args: argparse.Namespace, api: FakeBotAPI) -> dict:
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from config import config
+    from db.connection import open_db, close_db
+    from db.repository import init_db
+    from services.sharding import run_sharded
+
+    # Workers open DB_PATH relative to the working directory
+    await open_db(1)
+    await init_db()
+    await seed_db(args.users, args.seeded)
+    await close_db()
+
+    api.updates = [raw for _, raw in updates]
+    last_id = updates[-1][1]["update_id"]
+
+    async def stop_when_idle() -> None:
+        # Done once every update was handed out and the API has gone quiet
+        while not (api.served_updates >= last_id and time.monotonic() - api.last_call > args.idle):
+            await asyncio.sleep(0.1)
+        os.kill(os.getpid(), signal.SIGINT)
+
+    bot = Bot(token=config.BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(api.base_url)))
+    watcher = asyncio.create_task(stop_when_idle())
+    await run_sharded(bot, args.shards, ALLOWED_UPDATES)
+    watcher.cancel()
+    await bot.session.close()
+
+    wall = api.last_call - api.first_update_served
+    return {
+        "mode": f"sharded x{args.shards}",
+        "updates": len(updates),
+        "wall_s": round(wall, 3),
+        "throughput_per_s": round(len(updates) / wall, 1) if wall > 0 else None,
+        "per_kind": {kind: {"updates": n} for kind, n in sorted(Counter(k for k, _ in updates).items(),
+                                                                  key=lambda item: KINDS.index(item[0]))},
+    }
+
+
+def print_report(result: dict, api: FakeBotAPI) -> None:
+    print(f"\n{result['mode']}: {result['updates']} updates in {result['wall_s']}s "
+          f"-> {result['throughput_per_s']} updates/s")
+    if "drained_s" in result:
+        print(f"(buffered albums and join recording drained at {result['drained_s']}s)")
+    print(f"\n{'type':<12}{'updates':>8}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}{'api/upd':>9}{'db/upd':>8}")
+    for kind, row in result["per_kind"].items():
+        if "p50_ms" not in row:
+            print(f"{kind:<12}{row['updates']:>8}")
+            continue
+        api_per = sum(row["api_calls"].values()) / row["updates"]
+        db_per = sum(row["db_calls"].values()) / row["updates"]
+        print(f"{kind:<12}{row['updates']:>8}{row['errors']:>8}{row['p50_ms']:>10.2f}{row['p99_ms']:>10.2f}"
+              f"{api_per:>9.2f}{db_per:>8.2f}")
+    for kind, row in result["per_kind"].items():
+        for label in ("api_calls", "db_calls"):
+            if row.get(label):
+                calls = ", ".join(f"{name}={n}" for name, n in sorted(row[label].items(), key=lambda x: -x[1]))
+                print(f"  {kind} {label.replace('_', ' ')}: {calls}")
+    background = result.get("background", {})
+    for label in ("api_calls", "db_calls"):
+        if background.get(label):
+            calls = ", ".join(f"{name}={n}" for name, n in sorted(background[label].items(), key=lambda x: -x[1]))
+            print(f"  background {label.replace('_', ' ')}: {calls}")
+    print(f"\nBot API calls served: {sum(api.calls.values())} ({', '.join(f'{m}={n}' for m, n in api.calls.most_common())})")
+    if api.rate_limited:
+        print(f"Injected 429s: {sum(api.rate_limited.values())} ({', '.join(f'{m}={n}' for m, n in api.rate_limited.most_common())})")
+
+
+async def _main(args: argparse.Namespace) -> dict:
+    api = FakeBotAPI(args.api_latency, args.api_jitter, args.rate_limit, args.retry_after, args.seed)
+    await api.start()
+    try:
+        updates = generate_updates(args.updates, args.mix, args.users, args.join_burst, args.album_size, args.seed)
+        if args.shards > 1:
+            result = await run_shards(updates, args, api)
+        else:
+            result = await run_local(updates, args, api)
+        result["api_served"] = dict(api.calls)
+        result["api_rate_limited"] = dict(api.rate_limited)
+        print_report(result, api)
+        return result
+    finally:
+        await api.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--updates", type=int, default=5000, help="number of updates to replay")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"relative weights per update type (default {DEFAULT_MIX})")
+    parser.add_argument("--users", type=int, default=2000, help="distinct users sending updates")
+    parser.add_argument("--seeded", type=float, default=0.8, help="fraction of users that already have an invite link")
+    parser.add_argument("--join-burst", type=int, default=5, help="join requests per burst")
+    parser.add_argument("--album-size", type=int, default=10, help="photos per album")
+    parser.add_argument("--concurrency", type=int, default=100, help="updates handled at once (local mode)")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="seconds added to every Bot API call")
+    parser.add_argument("--api-jitter", type=float, default=0.0, help="+/- seconds of random latency")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of send calls answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after seconds in injected 429s")
+    parser.add_argument("--real-limits", action="store_true", help="keep the configured outbound pacing")
+    parser.add_argument("--shards", type=int, default=0, help="run sharded mode with this many workers")
+    parser.add_argument("--idle", type=float, default=1.0, help="sharded mode: API idle seconds that mean done")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    _bench_env(args)
+    with tempfile.TemporaryDirectory(prefix="bench_") as workdir:
+        # Scratch database, join spool and logs; shard workers inherit the cwd
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            result = asyncio.run(_main(args))
+        finally:
+            os.chdir(cwd)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    sys.exit(1 if any(row.get("errors") for row in result["per_kind"].values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
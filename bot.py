@@ -10,6 +10,7 @@ from aiogram.filters import Command
 from urllib.parse import quote_plus
 import db
 from datetime import datetime
+from services.forwarding import send_any
 
 load_dotenv()
 
@@ -171,7 +172,7 @@ async def get_or_create_user_topic(tg_user_id, username=None, first_name=None):
 async def forward_to_staff_topic(message: types.Message, topic_id=None):
     """
     Forward any type of message content to staff chat (optionally to a specific topic).
-    Handles: text, photo, video, voice, audio, document, animation, sticker, video_note, etc.
+    Uses the shared copy_message-based engine, one API call per content type.
     """
     try:
         user_info = f"From: @{message.from_user.username or 'unknown'} (ID: {message.from_user.id})"
@@ -180,145 +181,7 @@ async def forward_to_staff_topic(message: types.Message, topic_id=None):
         
         # Prepare message_thread_id if topic is available
         message_thread_id = topic_id if topic_id else None
-        
-        # Handle different message types
-        if message.text:
-            # Plain text message
-            text_content = f"{user_info}\n\n{message.text}"
-            await bot.send_message(
-                STAFF_CHAT_ID,
-                text_content,
-                message_thread_id=message_thread_id
-            )
-        elif message.photo:
-            # Photo with optional caption
-            caption = f"{user_info}\n\n{message.caption}" if message.caption else user_info
-            await bot.send_photo(
-                STAFF_CHAT_ID,
-                message.photo[-1].file_id,  # Highest resolution
-                caption=caption,
-                message_thread_id=message_thread_id
-            )
-        elif message.video:
-            # Video with optional caption
-            caption = f"{user_info}\n\n{message.caption}" if message.caption else user_info
-            await bot.send_video(
-                STAFF_CHAT_ID,
-                message.video.file_id,
-                caption=caption,
-                message_thread_id=message_thread_id
-            )
-        elif message.voice:
-            # Voice message with optional caption
-            caption = f"{user_info}\n\n{message.caption}" if message.caption else user_info
-            await bot.send_voice(
-                STAFF_CHAT_ID,
-                message.voice.file_id,
-                caption=caption,
-                message_thread_id=message_thread_id
-            )
-        elif message.audio:
-            # Audio file with optional caption
-            caption = f"{user_info}\n\n{message.caption}" if message.caption else user_info
-            await bot.send_audio(
-                STAFF_CHAT_ID,
-                message.audio.file_id,
-                caption=caption,
-                message_thread_id=message_thread_id
-            )
-        elif message.document:
-            # Document with optional caption
-            caption = f"{user_info}\n\n{message.caption}" if message.caption else user_info
-            await bot.send_document(
-                STAFF_CHAT_ID,
-                message.document.file_id,
-                caption=caption,
-                message_thread_id=message_thread_id
-            )
-        elif message.animation:
-            # GIF/Animation with optional caption
-            caption = f"{user_info}\n\n{message.caption}" if message.caption else user_info
-            await bot.send_animation(
-                STAFF_CHAT_ID,
-                message.animation.file_id,
-                caption=caption,
-                message_thread_id=message_thread_id
-            )
-        elif message.sticker:
-            # Sticker
-            await bot.send_message(
-                STAFF_CHAT_ID,
-                f"{user_info}\n\n[Sent a sticker]",
-                message_thread_id=message_thread_id
-            )
-            await bot.send_sticker(
-                STAFF_CHAT_ID,
-                message.sticker.file_id,
-                message_thread_id=message_thread_id
-            )
-        elif message.video_note:
-            # Video note (round video)
-            await bot.send_message(
-                STAFF_CHAT_ID,
-                f"{user_info}\n\n[Sent a video note]",
-                message_thread_id=message_thread_id
-            )
-            await bot.send_video_note(
-                STAFF_CHAT_ID,
-                message.video_note.file_id,
-                message_thread_id=message_thread_id
-            )
-        elif message.contact:
-            # Contact
-            await bot.send_contact(
-                STAFF_CHAT_ID,
-                phone_number=message.contact.phone_number,
-                first_name=message.contact.first_name,
-                last_name=message.contact.last_name,
-                message_thread_id=message_thread_id
-            )
-            await bot.send_message(
-                STAFF_CHAT_ID,
-                f"{user_info}\n\n[Sent a contact]",
-                message_thread_id=message_thread_id
-            )
-        elif message.location:
-            # Location
-            await bot.send_location(
-                STAFF_CHAT_ID,
-                latitude=message.location.latitude,
-                longitude=message.location.longitude,
-                message_thread_id=message_thread_id
-            )
-            await bot.send_message(
-                STAFF_CHAT_ID,
-                f"{user_info}\n\n[Sent a location]",
-                message_thread_id=message_thread_id
-            )
-        elif message.forward_from or message.forward_from_chat:
-            # Forwarded message - try to forward it
-            try:
-                await message.forward(STAFF_CHAT_ID, message_thread_id=message_thread_id)
-                await bot.send_message(
-                    STAFF_CHAT_ID,
-                    f"{user_info}\n\n[Forwarded message]",
-                    message_thread_id=message_thread_id
-                )
-            except Exception as e:
-                logging.warning(f"Could not forward message: {e}")
-                await bot.send_message(
-                    STAFF_CHAT_ID,
-                    f"{user_info}\n\n[Could not forward message - content may be protected]",
-                    message_thread_id=message_thread_id
-                )
-        else:
-            # Unknown content type - send info message
-            await bot.send_message(
-                STAFF_CHAT_ID,
-                f"{user_info}\n\n[Sent unsupported content type]",
-                message_thread_id=message_thread_id
-            )
-        
+        await send_any(bot, message, STAFF_CHAT_ID, user_info, message_thread_id)
         return True
     except Exception as e:
         logging.exception(f"Error forwarding message to staff: {e}")
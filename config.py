@@ -13,6 +13,60 @@ class Config:
     JOIN_REQUESTS_ENABLED: bool = os.getenv("JOIN_REQUESTS_ENABLED", "yes").lower() == "yes"
     DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
 
+    # Logging: size-based rotation by default, or time-based when LOG_ROTATE_WHEN
+    # is set (e.g. "midnight"); rotated files are gzipped
+    LOG_FILE: str = os.getenv("LOG_FILE", "bot.log")
+    LOG_MAX_BYTES: int = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT: int = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+    LOG_ROTATE_WHEN: str = os.getenv("LOG_ROTATE_WHEN", "")
+    LOG_JSON: bool = os.getenv("LOG_JSON", "false").lower() == "true"
+
+    # Prometheus-style /metrics endpoint; 0 disables it. Sharded workers serve
+    # on METRICS_PORT + 1 + worker index.
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "0"))
+
+    # Database
+    DB_READERS: int = int(os.getenv("DB_READERS", "4"))
+
+    # Outbound Bot API pacing (Telegram: ~30 msg/s overall, ~1/s per user, ~20/min per group)
+    SEND_GLOBAL_RATE: float = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+    SEND_PRIVATE_RATE: float = float(os.getenv("SEND_PRIVATE_RATE", "1"))
+    SEND_GROUP_PER_MINUTE: float = float(os.getenv("SEND_GROUP_PER_MINUTE", "20"))
+    SEND_MAX_RETRIES: int = int(os.getenv("SEND_MAX_RETRIES", "3"))
+
+    # Staff join notifications are batched into one digest message
+    JOIN_DIGEST_INTERVAL: float = float(os.getenv("JOIN_DIGEST_INTERVAL", "30"))
+    JOIN_DIGEST_MAX: int = int(os.getenv("JOIN_DIGEST_MAX", "50"))
+    # Seconds to wait for further items of an album before relaying it
+    MEDIA_GROUP_WINDOW: float = float(os.getenv("MEDIA_GROUP_WINDOW", "1.0"))
+
+    # Join-request pipeline: approval concurrency, record queue and its overflow spool
+    JOIN_APPROVE_CONCURRENCY: int = int(os.getenv("JOIN_APPROVE_CONCURRENCY", "20"))
+    JOIN_QUEUE_SIZE: int = int(os.getenv("JOIN_QUEUE_SIZE", "10000"))
+    JOIN_SPOOL_PATH: str = os.getenv("JOIN_SPOOL_PATH", "join_spool.jsonl")
+
+    # Staff /broadcast: concurrent senders and recipients read per page
+    BROADCAST_CONCURRENCY: int = int(os.getenv("BROADCAST_CONCURRENCY", "30"))
+    BROADCAST_PAGE_SIZE: int = int(os.getenv("BROADCAST_PAGE_SIZE", "1000"))
+
+    # Webhook mode (used instead of long polling when WEBHOOK_URL is set)
+    WEBHOOK_URL: str = os.getenv("WEBHOOK_URL", "")
+    WEBHOOK_PATH: str = os.getenv("WEBHOOK_PATH", "/webhook")
+    WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_HOST: str = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT: int = int(os.getenv("WEBHOOK_PORT", "8080"))
+    WEBHOOK_CONCURRENCY: int = int(os.getenv("WEBHOOK_CONCURRENCY", "100"))
+    WEBHOOK_DRAIN_TIMEOUT: float = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30"))
+
+    # Sharded mode: >1 routes updates by user id to this many worker processes
+    SHARD_WORKERS: int = int(os.getenv("SHARD_WORKERS", "0"))
+    SHARD_WORKER_CONCURRENCY: int = int(os.getenv("SHARD_WORKER_CONCURRENCY", "100"))
+
+    # Pre-minted invite links: refill below LOW up to HIGH (HIGH=0 disables the pool)
+    INVITE_POOL_LOW: int = int(os.getenv("INVITE_POOL_LOW", "50"))
+    INVITE_POOL_HIGH: int = int(os.getenv("INVITE_POOL_HIGH", "200"))
+
     # Campaign texts
     CAMPAIGN_HEADER: str = os.getenv("CAMPAIGN_HEADER", "Share Havan Academy to your classmates**\n\nTotal Invited: {}\nRank: {}")
     SHARE_BODY: str = os.getenv("SHARE_BODY", (
@@ -34,6 +88,37 @@ class Config:
         self.STAFF_CHAT_ID = int(os.getenv("STAFF_CHAT_ID", "0"))
         self.JOIN_REQUESTS_ENABLED = os.getenv("JOIN_REQUESTS_ENABLED", "yes").lower() == "yes"
         self.DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+        self.LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+        self.LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+        self.LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+        self.LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "")
+        self.LOG_JSON = os.getenv("LOG_JSON", "false").lower() == "true"
+        self.METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+        self.METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+        self.DB_READERS = int(os.getenv("DB_READERS", "4"))
+        self.SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+        self.SEND_PRIVATE_RATE = float(os.getenv("SEND_PRIVATE_RATE", "1"))
+        self.SEND_GROUP_PER_MINUTE = float(os.getenv("SEND_GROUP_PER_MINUTE", "20"))
+        self.SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
+        self.JOIN_DIGEST_INTERVAL = float(os.getenv("JOIN_DIGEST_INTERVAL", "30"))
+        self.JOIN_DIGEST_MAX = int(os.getenv("JOIN_DIGEST_MAX", "50"))
+        self.MEDIA_GROUP_WINDOW = float(os.getenv("MEDIA_GROUP_WINDOW", "1.0"))
+        self.JOIN_APPROVE_CONCURRENCY = int(os.getenv("JOIN_APPROVE_CONCURRENCY", "20"))
+        self.JOIN_QUEUE_SIZE = int(os.getenv("JOIN_QUEUE_SIZE", "10000"))
+        self.JOIN_SPOOL_PATH = os.getenv("JOIN_SPOOL_PATH", "join_spool.jsonl")
+        self.BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "30"))
+        self.BROADCAST_PAGE_SIZE = int(os.getenv("BROADCAST_PAGE_SIZE", "1000"))
+        self.WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+        self.WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+        self.WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+        self.WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+        self.WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+        self.WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", "100"))
+        self.WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30"))
+        self.SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "0"))
+        self.SHARD_WORKER_CONCURRENCY = int(os.getenv("SHARD_WORKER_CONCURRENCY", "100"))
+        self.INVITE_POOL_LOW = int(os.getenv("INVITE_POOL_LOW", "50"))
+        self.INVITE_POOL_HIGH = int(os.getenv("INVITE_POOL_HIGH", "200"))
         self.CAMPAIGN_HEADER = os.getenv("CAMPAIGN_HEADER", self.CAMPAIGN_HEADER)
         self.SHARE_BODY = os.getenv("SHARE_BODY", self.SHARE_BODY)
 
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+import aiosqlite
+
+DB_PATH = "havan_bot.db"
+
+# Applied to every connection. journal_mode=WAL is persistent in the file, so
+# readers never block the writer and vice versa.
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=134217728",
+)
+
+_writer: Optional[aiosqlite.Connection] = None
+_writer_lock: Optional[asyncio.Lock] = None
+_readers: Optional[asyncio.Queue] = None
+_reader_conns: List[aiosqlite.Connection] = []
+_open_lock: Optional[asyncio.Lock] = None
+
+
+async def _connect(read_only: bool = False) -> aiosqlite.Connection:
+    conn = await aiosqlite.connect(DB_PATH)
+    for pragma in _PRAGMAS:
+        await conn.execute(pragma)
+    if read_only:
+        await conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+async def open_db(readers: int = 4) -> None:
+    """Open the shared writer connection and the reader pool (idempotent)."""
+    global _writer, _writer_lock, _readers, _open_lock
+    if _open_lock is None:
+        _open_lock = asyncio.Lock()
+    async with _open_lock:
+        if _writer is not None:
+            return
+        writer_conn = await _connect()
+        pool: asyncio.Queue = asyncio.Queue()
+        for _ in range(max(1, readers)):
+            conn = await _connect(read_only=True)
+            _reader_conns.append(conn)
+            pool.put_nowait(conn)
+        _writer = writer_conn
+        _writer_lock = asyncio.Lock()
+        _readers = pool
+        logging.info(f"DB pool opened: 1 writer, {len(_reader_conns)} readers ({DB_PATH})")
+
+
+async def close_db() -> None:
+    """Close all pooled connections. Safe to call when the pool is not open."""
+    global _writer, _writer_lock, _readers
+    if _writer is None:
+        return
+    async with _writer_lock:
+        for conn in _reader_conns:
+            try:
+                await conn.close()
+            except Exception as e:
+                logging.debug(f"Closing reader connection failed: {e}")
+        _reader_conns.clear()
+        try:
+            await _writer.close()
+        except Exception as e:
+            logging.debug(f"Closing writer connection failed: {e}")
+        _writer = None
+        _readers = None
+    _writer_lock = None
+    logging.info("DB pool closed")
+
+
+@asynccontextmanager
+async def writer() -> AsyncIterator[aiosqlite.Connection]:
+    """Exclusive access to the writer connection; commits on success, rolls back on error."""
+    if _writer is None:
+        await open_db()
+    async with _writer_lock:
+        try:
+            yield _writer
+        except BaseException:
+            await _writer.rollback()
+            raise
+        else:
+            await _writer.commit()
+
+
+@asynccontextmanager
+async def reader() -> AsyncIterator[aiosqlite.Connection]:
+    """Borrow a read-only connection from the pool for the duration of the block."""
+    if _readers is None:
+        await open_db()
+    pool = _readers
+    conn = await pool.get()
+    try:
+        yield conn
+    finally:
+        pool.put_nowait(conn)
@@ -0,0 +1,38 @@
+from typing import Iterable, Set
+
+
+def _key(invite_link: str) -> str:
+    # https://t.me/+AbC123... -> AbC123...; the random suffix is unique per link
+    return invite_link.rsplit("/", 1)[-1].lstrip("+")
+
+
+class InviteIndex:
+    """Set of active bot-created invite links, keyed by link suffix.
+
+    Lets the join-request handler reject admin-created or unknown links
+    without touching SQLite. Until load() has run it answers True for
+    everything so callers fall back to the DB check.
+    """
+
+    def __init__(self):
+        self._keys: Set[str] = set()
+        self.loaded = False
+
+    def load(self, links: Iterable[str]) -> None:
+        self._keys = {_key(link) for link in links}
+        self.loaded = True
+
+    def add(self, invite_link: str) -> None:
+        self._keys.add(_key(invite_link))
+
+    def discard(self, invite_link: str) -> None:
+        self._keys.discard(_key(invite_link))
+
+    def __contains__(self, invite_link: str) -> bool:
+        return not self.loaded or _key(invite_link) in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+invite_index = InviteIndex()
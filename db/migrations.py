@@ -0,0 +1,193 @@
+import logging
+from typing import Awaitable, Callable, List, Tuple
+
+import aiosqlite
+
+# Schema migrations, applied in order and exactly once per database.
+# PRAGMA user_version holds the number of the last applied migration, so an
+# up-to-date database costs a single pragma read at startup; the
+# schema_migrations table keeps a human-readable history of when each ran.
+# Never edit or reorder an applied migration; append a new one instead.
+
+Migration = Callable[[aiosqlite.Connection], Awaitable[None]]
+
+
+async def _initial_schema(conn: aiosqlite.Connection) -> None:
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            tg_user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS invite_links (
+            invite_link TEXT PRIMARY KEY,
+            tg_user_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            active INTEGER DEFAULT 1,
+            FOREIGN KEY (tg_user_id) REFERENCES users(tg_user_id)
+        )
+    ''')
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS join_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invite_link TEXT NOT NULL,
+            joined_user_id INTEGER NOT NULL,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (invite_link) REFERENCES invite_links(invite_link)
+        )
+    ''')
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_topics (
+            tg_user_id INTEGER PRIMARY KEY,
+            topic_id INTEGER UNIQUE NOT NULL,
+            topic_name TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (tg_user_id) REFERENCES users(tg_user_id)
+        )
+    ''')
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS submissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tg_user_id INTEGER NOT NULL,
+            file_ids TEXT,
+            caption TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            staff_handled BOOLEAN DEFAULT FALSE,
+            FOREIGN KEY (tg_user_id) REFERENCES users(tg_user_id)
+        )
+    ''')
+
+
+async def _unique_invite_link_per_user(conn: aiosqlite.Connection) -> None:
+    # Older databases may hold several links per user; keep the newest
+    await conn.execute('''
+        DELETE FROM invite_links
+        WHERE rowid NOT IN (
+            SELECT MAX(rowid) FROM invite_links GROUP BY tg_user_id
+        )
+    ''')
+    await conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS ux_invite_links_user ON invite_links(tg_user_id)')
+
+
+async def _unique_join_per_link_and_user(conn: aiosqlite.Connection) -> None:
+    await conn.execute('''
+        DELETE FROM join_events
+        WHERE rowid NOT IN (
+            SELECT MAX(rowid) FROM join_events GROUP BY invite_link, joined_user_id
+        )
+    ''')
+    await conn.execute(
+        'CREATE UNIQUE INDEX IF NOT EXISTS ux_join_events_unique ON join_events(invite_link, joined_user_id)'
+    )
+
+
+async def _referral_counts(conn: aiosqlite.Connection) -> None:
+    # Materialized per-referrer join counters, maintained by record_join
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS referral_counts (
+            tg_user_id INTEGER PRIMARY KEY,
+            joins INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    await conn.execute('DELETE FROM referral_counts')
+    await conn.execute('''
+        INSERT INTO referral_counts (tg_user_id, joins)
+        SELECT il.tg_user_id, COUNT(*) FROM join_events je
+        JOIN invite_links il ON je.invite_link = il.invite_link
+        GROUP BY il.tg_user_id
+    ''')
+
+
+async def _invite_pool(conn: aiosqlite.Connection) -> None:
+    # Pre-minted invite links not yet assigned to a user (services/invite_pool.py)
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS invite_pool (
+            invite_link TEXT PRIMARY KEY,
+            creates_join_request INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+async def _invite_pool_index(conn: aiosqlite.Connection) -> None:
+    # count_pooled_invites and claim_pooled_invite filter on the link kind; the
+    # implicit rowid suffix also serves claim's ORDER BY rowid
+    await conn.execute('CREATE INDEX IF NOT EXISTS ix_invite_pool_kind ON invite_pool(creates_join_request)')
+
+
+async def _broadcasts(conn: aiosqlite.Connection) -> None:
+    # Staff broadcasts and their resume checkpoint (services/broadcast.py):
+    # every user with tg_user_id <= last_user_id has been sent to
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            from_chat_id INTEGER,
+            message_id INTEGER,
+            text TEXT,
+            report_chat_id INTEGER NOT NULL,
+            started_by INTEGER,
+            status TEXT NOT NULL DEFAULT 'running',
+            last_user_id INTEGER NOT NULL DEFAULT 0,
+            delivered INTEGER NOT NULL DEFAULT 0,
+            blocked INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    await conn.execute('CREATE INDEX IF NOT EXISTS ix_broadcasts_status ON broadcasts(status)')
+
+
+# (version, name, migration); versions are 1-based and contiguous
+MIGRATIONS: List[Tuple[int, str, Migration]] = [
+    (1, "initial schema", _initial_schema),
+    (2, "unique invite link per user", _unique_invite_link_per_user),
+    (3, "unique join per link and user", _unique_join_per_link_and_user),
+    (4, "referral_counts", _referral_counts),
+    (5, "invite_pool", _invite_pool),
+    (6, "invite_pool kind index", _invite_pool_index),
+    (7, "broadcasts", _broadcasts),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+async def schema_version(conn: aiosqlite.Connection) -> int:
+    cur = await conn.execute('PRAGMA user_version')
+    return (await cur.fetchone())[0]
+
+
+async def migrate(conn: aiosqlite.Connection) -> int:
+    """Apply pending migrations, each in its own transaction; returns how many ran."""
+    current = await schema_version(conn)
+    if current >= LATEST_VERSION:
+        return 0
+    if conn.in_transaction:
+        await conn.commit()
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    applied = 0
+    for version, name, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        logging.info(f"Applying DB migration {version}: {name}")
+        await conn.execute('BEGIN IMMEDIATE')
+        try:
+            await migration(conn)
+            await conn.execute('INSERT OR REPLACE INTO schema_migrations (version, name) VALUES (?, ?)', (version, name))
+            # PRAGMA does not take parameters; version is an int from MIGRATIONS
+            await conn.execute(f'PRAGMA user_version = {int(version)}')
+            await conn.commit()
+        except BaseException:
+            await conn.rollback()
+            raise
+        applied += 1
+    return applied
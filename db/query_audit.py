@@ -0,0 +1,140 @@
+"""Query-plan audit for db/repository.py.
+
+Calls every repository coroutine against a scratch database, captures the
+SQL each one actually executes, and runs EXPLAIN QUERY PLAN on it. Exits
+non-zero if an interactive query scans a whole table, or if a repository
+function is not covered by the audit.
+
+    python -m db.query_audit               # fresh database from migrations
+    python -m db.query_audit --db bot.db   # a copy of an existing database (uses its ANALYZE stats)
+"""
+import argparse
+import asyncio
+import inspect
+import os
+import re
+import shutil
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+import db.connection as connection
+from db import repository
+
+# Batch jobs that read whole tables by design; reported but not failed
+BATCH = {"init_db", "rebuild_referral_counts", "load_caches", "load_rank_index", "iter_export_rows", "count_users"}
+
+_SKIP = re.compile(r"^\s*(PRAGMA|BEGIN|COMMIT|ROLLBACK|CREATE|DROP|ANALYZE)\b", re.IGNORECASE)
+_FULL_SCAN = re.compile(r"\bSCAN (?!CONSTANT ROW)")
+
+
+async def _drain(agen) -> None:
+    async for _ in agen:
+        pass
+
+
+def _exercises() -> List[Tuple[str, callable]]:
+    """(function name, call) pairs, in an order that leaves data for later calls."""
+    r = repository
+    return [
+        ("init_db", lambda: r.init_db()),
+        ("ensure_user", lambda: r.ensure_user(1, "alice", "Alice")),
+        ("flush_pending_users", lambda: r.flush_pending_users()),
+        ("save_invite_link", lambda: r.save_invite_link("https://t.me/+a", 1)),
+        ("get_invite_by_user", lambda: r.get_invite_by_user(1)),
+        ("add_pooled_invite", lambda: r.add_pooled_invite("https://t.me/+p", True)),
+        ("count_pooled_invites", lambda: r.count_pooled_invites(True)),
+        ("claim_pooled_invite", lambda: r.claim_pooled_invite(2, True)),
+        ("get_invite_by_link", lambda: r.get_invite_by_link("https://t.me/+a")),
+        ("record_join", lambda: r.record_join("https://t.me/+a", 10)),
+        ("record_tracked_join", lambda: r.record_tracked_join("https://t.me/+a", 11)),
+        ("get_user_join_count", lambda: r.get_user_join_count(1)),
+        ("get_rank", lambda: r.get_rank(1)),
+        ("get_user_names", lambda: r.get_user_names([1, 2])),
+        ("save_user_topic", lambda: r.save_user_topic(1, 100, "Alice")),
+        ("get_user_topic", lambda: r.get_user_topic(1)),
+        ("get_user_by_topic", lambda: r.get_user_by_topic(100)),
+        ("save_submission", lambda: r.save_submission(1, ["file"], "caption")),
+        ("create_broadcast", lambda: r.create_broadcast(-100, 5, None, -100, 1)),
+        ("count_users", lambda: r.count_users()),
+        ("confirm_broadcast", lambda: r.confirm_broadcast(1)),
+        ("get_running_broadcasts", lambda: r.get_running_broadcasts()),
+        ("get_broadcast_recipients", lambda: r.get_broadcast_recipients(0, 100)),
+        ("save_broadcast_progress", lambda: r.save_broadcast_progress(1, 1, 1, 0, 0)),
+        ("cancel_broadcast", lambda: r.cancel_broadcast(1)),
+        ("load_caches", lambda: r.load_caches()),
+        ("load_rank_index", lambda: r.load_rank_index()),
+        ("rebuild_referral_counts", lambda: r.rebuild_referral_counts()),
+        ("iter_export_rows", lambda: asyncio.gather(*(
+            _drain(r.iter_export_rows(table, batch_size=1)) for table in r.EXPORT_TABLES
+        ))),
+    ]
+
+
+async def audit(db_path: str) -> int:
+    connection.DB_PATH = db_path
+    await connection.open_db(1)
+    current = [""]
+    captured: Dict[str, List[str]] = {}
+
+    def trace(sql: str) -> None:
+        if not _SKIP.match(sql):
+            captured.setdefault(current[0], []).append(sql)
+
+    for conn in connection._reader_conns + [connection._writer]:
+        await conn.set_trace_callback(trace)
+
+    exercises = _exercises()
+    try:
+        for name, call in exercises:
+            current[0] = name
+            await call()
+        await connection._writer.set_trace_callback(None)
+
+        failures = 0
+        async with connection.reader() as conn:
+            await conn.set_trace_callback(None)
+            for name, statements in captured.items():
+                for sql in dict.fromkeys(statements):
+                    cur = await conn.execute(f"EXPLAIN QUERY PLAN {sql}")
+                    plan = [row[3] for row in await cur.fetchall()]
+                    scans = [step for step in plan if _FULL_SCAN.search(step)]
+                    status = "ok"
+                    if scans:
+                        status = "batch" if name in BATCH else "FULL SCAN"
+                        failures += name not in BATCH
+                    print(f"[{status}] {name}: {' '.join(sql.split())}")
+                    for step in plan:
+                        print(f"      {step}")
+    finally:
+        await connection.close_db()
+
+    covered = {name for name, _ in exercises}
+    public = {
+        name for name, fn in inspect.getmembers(repository)
+        if not name.startswith("_") and getattr(fn, "__module__", None) == repository.__name__
+        and (inspect.iscoroutinefunction(fn) or inspect.isasyncgenfunction(fn))
+    }
+    for name in sorted(public - covered):
+        print(f"[NOT AUDITED] {name}: add it to db/query_audit.py")
+        failures += 1
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="audit a copy of this database instead of a fresh one")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "audit.db")
+        if args.db:
+            for suffix in ("", "-wal"):
+                if os.path.exists(args.db + suffix):
+                    shutil.copy(args.db + suffix, path + suffix)
+        failures = asyncio.run(audit(path))
+    print(f"{failures} problem(s)" if failures else "All interactive queries use indexes")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class RankIndex:
+    """In-memory leaderboard of referrers ordered by join count.
+
+    Mirrors the old SQL ranking: ROW_NUMBER() over users that own an invite
+    link, ordered by join count descending. Ties are broken by tg_user_id
+    ascending, which is the order SQLite scanned the users table in.
+    """
+
+    def __init__(self):
+        # Sorted ascending by (-joins, tg_user_id), so index 0 is rank 1
+        self._keys: List[Tuple[int, int]] = []
+        self._scores: Dict[int, int] = {}
+        self._total = 0
+        self.loaded = False
+
+    def load(self, rows: Iterable[Tuple[int, int]], total: int) -> None:
+        self._scores = {tg_user_id: joins for tg_user_id, joins in rows}
+        self._keys = sorted((-joins, tg_user_id) for tg_user_id, joins in self._scores.items())
+        self._total = total
+        self.loaded = True
+
+    def add(self, tg_user_id: int) -> None:
+        """Register a new invite-link owner with zero joins."""
+        if tg_user_id in self._scores:
+            return
+        self._scores[tg_user_id] = 0
+        insort(self._keys, (0, tg_user_id))
+        self._total += 1
+
+    def increment(self, tg_user_id: int, by: int = 1) -> None:
+        old = self._scores.get(tg_user_id)
+        if old is None:
+            return
+        idx = bisect_left(self._keys, (-old, tg_user_id))
+        del self._keys[idx]
+        self._scores[tg_user_id] = old + by
+        insort(self._keys, (-(old + by), tg_user_id))
+
+    def top(self, k: int) -> List[Tuple[int, int]]:
+        """The k best referrers as (tg_user_id, joins), best first; O(k)."""
+        return [(tg_user_id, -neg_joins) for neg_joins, tg_user_id in self._keys[:k]]
+
+    def rank(self, tg_user_id: int) -> Tuple[Optional[int], int]:
+        score = self._scores.get(tg_user_id)
+        if score is None:
+            return None, self._total
+        return bisect_left(self._keys, (-score, tg_user_id)) + 1, self._total
+
+
+rank_index = RankIndex()
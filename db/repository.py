@@ -1,178 +1,290 @@
-import aiosqlite
-from typing import Optional, Tuple, List
+import asyncio
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple, List
 import logging
+from db.connection import DB_PATH, reader, writer
+from db.migrations import LATEST_VERSION, migrate
+from db.ranking import rank_index
+from db.invite_index import invite_index
+from utils.metrics import registry, timed
 
-DB_PATH = "havan_bot.db"
+# Latency, call count and failures per public repository function
+db_call = timed(
+    registry.histogram("bot_db_call_seconds", "Repository call latency by function", "function"),
+    registry.counter("bot_db_call_errors_total", "Failed repository calls by function", "function"),
+)
 
-async def init_db():
-    async with aiosqlite.connect(DB_PATH) as conn:
-        # Users table
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                tg_user_id INTEGER PRIMARY KEY,
-                username TEXT,
-                first_name TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        # Invite links table
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS invite_links (
-                invite_link TEXT PRIMARY KEY,
-                tg_user_id INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                active INTEGER DEFAULT 1,
-                FOREIGN KEY (tg_user_id) REFERENCES users(tg_user_id)
-            )
-        ''')
-        # Deduplicate invite_links by tg_user_id (keep the newest row)
-        try:
-            await conn.execute('''
-                DELETE FROM invite_links
-                WHERE rowid NOT IN (
-                    SELECT MAX(rowid) FROM invite_links GROUP BY tg_user_id
-                )
-            ''')
-        except Exception as e:
-            logging.debug(f"Dedup invite_links skipped/failed: {e}")
-        # Add unique index to enforce one link per user
-        try:
-            await conn.execute('''
-                CREATE UNIQUE INDEX IF NOT EXISTS ux_invite_links_user ON invite_links(tg_user_id)
-            ''')
-        except Exception as e:
-            logging.warning(f"Could not create unique index on invite_links(tg_user_id): {e}")
+# ensure_user is write-behind: upserts are merged per user and flushed in one
+# transaction every USER_FLUSH_INTERVAL seconds, or as soon as
+# USER_FLUSH_MAX_PENDING distinct users are waiting.
+USER_FLUSH_INTERVAL = 1.0
+USER_FLUSH_MAX_PENDING = 500
 
-        # Join events table
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS join_events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                invite_link TEXT NOT NULL,
-                joined_user_id INTEGER NOT NULL,
-                joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (invite_link) REFERENCES invite_links(invite_link)
-            )
-        ''')
-        # Deduplicate join_events (keep the newest row per pair)
-        try:
-            await conn.execute('''
-                DELETE FROM join_events
-                WHERE rowid NOT IN (
-                    SELECT MAX(rowid) FROM join_events GROUP BY invite_link, joined_user_id
-                )
-            ''')
-        except Exception as e:
-            logging.debug(f"Dedup join_events skipped/failed: {e}")
-        # Prevent duplicate join rows per (invite_link, user)
+_pending_users: Dict[int, Tuple[Optional[str], Optional[str]]] = {}
+_flush_task: Optional[asyncio.Task] = None
+
+# Called as listener(event, *args) whenever the in-memory indexes change, so
+# other worker processes can mirror the change (see services/sharding.py).
+# Events: "invite_saved" (invite_link, tg_user_id), "join_recorded" (owner_id),
+# "rank_reloaded" ().
+cache_listeners: List[Callable[..., None]] = []
+
+def _notify(event: str, *args):
+    for listener in cache_listeners:
         try:
-            await conn.execute('''
-                CREATE UNIQUE INDEX IF NOT EXISTS ux_join_events_unique ON join_events(invite_link, joined_user_id)
-            ''')
+            listener(event, *args)
         except Exception as e:
-            logging.warning(f"Could not create unique index on join_events(invite_link, joined_user_id): {e}")
+            logging.warning(f"Cache listener failed for {event}: {e}")
 
-        # User topics table
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS user_topics (
-                tg_user_id INTEGER PRIMARY KEY,
-                topic_id INTEGER UNIQUE NOT NULL,
-                topic_name TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (tg_user_id) REFERENCES users(tg_user_id)
-            )
-        ''')
-        # Submissions table (if needed)
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS submissions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                tg_user_id INTEGER NOT NULL,
-                file_ids TEXT,
-                caption TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                staff_handled BOOLEAN DEFAULT FALSE,
-                FOREIGN KEY (tg_user_id) REFERENCES users(tg_user_id)
-            )
-        ''')
-        await conn.commit()
+@db_call
+async def init_db():
+    async with writer() as conn:
+        # Schema changes and one-off data fixes live in db/migrations.py; on an
+        # up-to-date database this is a single PRAGMA read
+        applied = await migrate(conn)
+        if applied:
+            logging.info(f"Applied {applied} DB migrations (schema version {LATEST_VERSION})")
+        await _load_caches(conn)
+
+async def _rebuild_referral_counts(conn) -> int:
+    await conn.execute('DELETE FROM referral_counts')
+    cur = await conn.execute('''
+        INSERT INTO referral_counts (tg_user_id, joins)
+        SELECT il.tg_user_id, COUNT(*) FROM join_events je
+        JOIN invite_links il ON je.invite_link = il.invite_link
+        GROUP BY il.tg_user_id
+    ''')
+    return cur.rowcount
+
+@db_call
+async def rebuild_referral_counts() -> int:
+    """Recompute referral_counts from join_events; returns the number of referrers."""
+    await flush_pending_users()
+    async with writer() as conn:
+        referrers = await _rebuild_referral_counts(conn)
+        # Reload under the writer lock so no join slips in between
+        await _load_rank_index(conn)
+    _notify("rank_reloaded")
+    return referrers
+
+async def _load_rank_index(conn):
+    cur = await conn.execute('SELECT COUNT(DISTINCT tg_user_id) FROM invite_links')
+    total_users = (await cur.fetchone())[0]
+    cur = await conn.execute('''
+        SELECT u.tg_user_id, COALESCE(rc.joins, 0) FROM users u
+        LEFT JOIN referral_counts rc ON rc.tg_user_id = u.tg_user_id
+        WHERE EXISTS (SELECT 1 FROM invite_links WHERE tg_user_id = u.tg_user_id)
+    ''')
+    rank_index.load(await cur.fetchall(), total_users)
+
+async def _load_caches(conn):
+    await _load_rank_index(conn)
+    cur = await conn.execute('SELECT invite_link FROM invite_links WHERE active = 1')
+    invite_index.load(row[0] for row in await cur.fetchall())
+
+@db_call
+async def load_caches():
+    """Seed the rank and invite-link indexes; init_db does this on its own."""
+    await flush_pending_users()
+    async with reader() as conn:
+        await _load_caches(conn)
+
+@db_call
+async def load_rank_index():
+    """Seed the in-memory leaderboard from invite_links and referral_counts."""
+    await flush_pending_users()
+    async with writer() as conn:
+        await _load_rank_index(conn)
 
 # Repository methods
+@db_call
 async def ensure_user(tg_user_id: int, username: Optional[str], first_name: Optional[str]):
-    async with aiosqlite.connect(DB_PATH) as conn:
-        await conn.execute('''
-            INSERT INTO users (tg_user_id, username, first_name)
-            VALUES (?, ?, ?)
-            ON CONFLICT(tg_user_id) DO UPDATE SET
-                username=excluded.username,
-                first_name=excluded.first_name
-        ''', (tg_user_id, username, first_name))
-        await conn.commit()
+    global _flush_task
+    _pending_users[tg_user_id] = (username, first_name)
+    if len(_pending_users) >= USER_FLUSH_MAX_PENDING:
+        await flush_pending_users()
+    elif _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.create_task(_flush_users_later())
+
+async def _flush_users_later():
+    await asyncio.sleep(USER_FLUSH_INTERVAL)
+    try:
+        await flush_pending_users()
+    except Exception as e:
+        logging.exception(f"Failed to flush pending users: {e}")
+
+@db_call
+async def flush_pending_users() -> int:
+    """Write all buffered ensure_user upserts in a single transaction."""
+    if not _pending_users:
+        return 0
+    batch = list(_pending_users.items())
+    _pending_users.clear()
+    try:
+        async with writer() as conn:
+            await conn.executemany('''
+                INSERT INTO users (tg_user_id, username, first_name)
+                VALUES (?, ?, ?)
+                ON CONFLICT(tg_user_id) DO UPDATE SET
+                    username=excluded.username,
+                    first_name=excluded.first_name
+            ''', [(tg_user_id, username, first_name) for tg_user_id, (username, first_name) in batch])
+    except Exception:
+        # Put the batch back without clobbering newer profile data
+        for tg_user_id, profile in batch:
+            _pending_users.setdefault(tg_user_id, profile)
+        raise
+    return len(batch)
 
+def pending_user_count() -> int:
+    return len(_pending_users)
+
+@db_call
 async def get_invite_by_user(tg_user_id: int) -> Optional[str]:
-    async with aiosqlite.connect(DB_PATH) as conn:
+    async with reader() as conn:
         cur = await conn.execute('SELECT invite_link FROM invite_links WHERE tg_user_id = ?', (tg_user_id,))
         row = await cur.fetchone()
         return row[0] if row else None
 
+@db_call
 async def save_invite_link(invite_link: str, tg_user_id: int):
-    async with aiosqlite.connect(DB_PATH) as conn:
+    async with writer() as conn:
         # Do not replace existing mapping to preserve a stable per-user link
-        await conn.execute('INSERT OR IGNORE INTO invite_links (invite_link, tg_user_id, active) VALUES (?, ?, 1)', (invite_link, tg_user_id))
-        await conn.commit()
+        cur = await conn.execute('INSERT OR IGNORE INTO invite_links (invite_link, tg_user_id, active) VALUES (?, ?, 1)', (invite_link, tg_user_id))
+        created = cur.rowcount == 1
+    if created:
+        _invite_saved(invite_link, tg_user_id)
 
-async def get_user_join_count(tg_user_id: int) -> int:
-    async with aiosqlite.connect(DB_PATH) as conn:
+def _invite_saved(invite_link: str, tg_user_id: int):
+    rank_index.add(tg_user_id)
+    invite_index.add(invite_link)
+    _notify("invite_saved", invite_link, tg_user_id)
+
+@db_call
+async def add_pooled_invite(invite_link: str, creates_join_request: bool):
+    async with writer() as conn:
+        await conn.execute('INSERT OR IGNORE INTO invite_pool (invite_link, creates_join_request) VALUES (?, ?)',
+                           (invite_link, int(creates_join_request)))
+
+@db_call
+async def count_pooled_invites(creates_join_request: bool) -> int:
+    async with reader() as conn:
+        cur = await conn.execute('SELECT COUNT(*) FROM invite_pool WHERE creates_join_request = ?', (int(creates_join_request),))
+        return (await cur.fetchone())[0]
+
+@db_call
+async def claim_pooled_invite(tg_user_id: int, creates_join_request: bool) -> Tuple[Optional[str], bool]:
+    """Assign the oldest pooled link to the user in one transaction.
+
+    Returns (invite_link, claimed): an existing link wins over the pool, and
+    (None, False) means the pool is empty.
+    """
+    async with writer() as conn:
+        cur = await conn.execute('SELECT invite_link FROM invite_links WHERE tg_user_id = ?', (tg_user_id,))
+        row = await cur.fetchone()
+        if row:
+            return row[0], False
         cur = await conn.execute('''
-            SELECT COUNT(*) FROM join_events je
-            JOIN invite_links il ON je.invite_link = il.invite_link
-            WHERE il.tg_user_id = ?
-        ''', (tg_user_id,))
+            DELETE FROM invite_pool WHERE invite_link = (
+                SELECT invite_link FROM invite_pool WHERE creates_join_request = ? ORDER BY rowid LIMIT 1
+            ) RETURNING invite_link
+        ''', (int(creates_join_request),))
+        row = await cur.fetchone()
+        if row is None:
+            return None, False
+        invite_link = row[0]
+        await conn.execute('INSERT INTO invite_links (invite_link, tg_user_id, active) VALUES (?, ?, 1)', (invite_link, tg_user_id))
+    _invite_saved(invite_link, tg_user_id)
+    return invite_link, True
+
+@db_call
+async def get_user_join_count(tg_user_id: int) -> int:
+    async with reader() as conn:
+        cur = await conn.execute('SELECT joins FROM referral_counts WHERE tg_user_id = ?', (tg_user_id,))
         row = await cur.fetchone()
         return row[0] if row else 0
 
+@db_call
 async def get_rank(tg_user_id: int) -> Tuple[Optional[int], int]:
-    async with aiosqlite.connect(DB_PATH) as conn:
-        # Get total users with invites
-        cur = await conn.execute('''
-            SELECT COUNT(DISTINCT tg_user_id) FROM invite_links
-        ''')
-        total_users = (await cur.fetchone())[0]
+    if not rank_index.loaded:
+        await load_rank_index()
+    return rank_index.rank(tg_user_id)
 
-        # Get rank of this user
-        cur = await conn.execute('''
-            SELECT rank FROM (
-                SELECT tg_user_id, ROW_NUMBER() OVER (ORDER BY (
-                    SELECT COUNT(*) FROM join_events je
-                    JOIN invite_links il ON je.invite_link = il.invite_link
-                    WHERE il.tg_user_id = u.tg_user_id
-                ) DESC) as rank
-                FROM users u
-                WHERE EXISTS (SELECT 1 FROM invite_links WHERE tg_user_id = u.tg_user_id)
-            ) WHERE tg_user_id = ?
-        ''', (tg_user_id,))
-        row = await cur.fetchone()
-        rank = row[0] if row else None
-        return rank, total_users
+@db_call
+async def get_user_names(tg_user_ids: List[int]) -> Dict[int, Tuple[Optional[str], Optional[str]]]:
+    """tg_user_id -> (username, first_name) for the given users."""
+    if not tg_user_ids:
+        return {}
+    async with reader() as conn:
+        placeholders = ",".join("?" * len(tg_user_ids))
+        cur = await conn.execute(
+            f'SELECT tg_user_id, username, first_name FROM users WHERE tg_user_id IN ({placeholders})',
+            tuple(tg_user_ids)
+        )
+        return {row[0]: (row[1], row[2]) for row in await cur.fetchall()}
 
+@db_call
 async def get_invite_by_link(invite_link: str) -> Optional[str]:
-    async with aiosqlite.connect(DB_PATH) as conn:
+    async with reader() as conn:
         cur = await conn.execute('SELECT invite_link FROM invite_links WHERE invite_link = ? AND active = 1', (invite_link,))
         row = await cur.fetchone()
         return row[0] if row else None
 
-async def record_join(invite_link: str, joined_user_id: int):
-    async with aiosqlite.connect(DB_PATH) as conn:
+async def _bump_referral_count(conn, owner_id: int):
+    await conn.execute('''
+        INSERT INTO referral_counts (tg_user_id, joins) VALUES (?, 1)
+        ON CONFLICT(tg_user_id) DO UPDATE SET joins = joins + 1
+    ''', (owner_id,))
+
+@db_call
+async def record_join(invite_link: str, joined_user_id: int) -> bool:
+    async with writer() as conn:
         # Ignore duplicates if already recorded
-        await conn.execute('INSERT OR IGNORE INTO join_events (invite_link, joined_user_id) VALUES (?, ?)', (invite_link, joined_user_id))
-        await conn.commit()
+        cur = await conn.execute('INSERT OR IGNORE INTO join_events (invite_link, joined_user_id) VALUES (?, ?)', (invite_link, joined_user_id))
+        if cur.rowcount != 1:
+            return False
+        cur = await conn.execute('SELECT tg_user_id FROM invite_links WHERE invite_link = ?', (invite_link,))
+        row = await cur.fetchone()
+        owner_id = row[0] if row else None
+        if owner_id is not None:
+            # Bump the owner's counter in the same transaction
+            await _bump_referral_count(conn, owner_id)
+    if owner_id is not None:
+        rank_index.increment(owner_id)
+        _notify("join_recorded", owner_id)
+    return True
+
+@db_call
+async def record_tracked_join(invite_link: str, joined_user_id: int) -> bool:
+    """Record a join through an active bot link; True only for a new join.
+
+    Link validation and the idempotent insert are one statement (relying on
+    ux_join_events_unique); the counter bump shares its transaction.
+    """
+    async with writer() as conn:
+        cur = await conn.execute('''
+            INSERT OR IGNORE INTO join_events (invite_link, joined_user_id)
+            SELECT invite_link, ? FROM invite_links WHERE invite_link = ? AND active = 1
+            RETURNING (SELECT tg_user_id FROM invite_links WHERE invite_link = ?)
+        ''', (joined_user_id, invite_link, invite_link))
+        row = await cur.fetchone()
+        if row is None:
+            return False
+        owner_id = row[0]
+        await _bump_referral_count(conn, owner_id)
+    rank_index.increment(owner_id)
+    _notify("join_recorded", owner_id)
+    return True
 
+@db_call
 async def get_user_topic(tg_user_id: int) -> Optional[int]:
-    async with aiosqlite.connect(DB_PATH) as conn:
+    async with reader() as conn:
         cur = await conn.execute('SELECT topic_id FROM user_topics WHERE tg_user_id = ?', (tg_user_id,))
         row = await cur.fetchone()
         return row[0] if row else None
 
+@db_call
 async def save_user_topic(tg_user_id: int, topic_id: int, topic_name: str):
-    async with aiosqlite.connect(DB_PATH) as conn:
+    async with writer() as conn:
         # Use UPSERT to prevent duplicate rows per user and update mapping if needed
         await conn.execute('''
             INSERT INTO user_topics (tg_user_id, topic_id, topic_name)
@@ -181,21 +293,125 @@ async def save_user_topic(tg_user_id: int, topic_id: int, topic_name: str):
                 topic_id=excluded.topic_id,
                 topic_name=excluded.topic_name
         ''' , (tg_user_id, topic_id, topic_name))
-        await conn.commit()
 
+@db_call
 async def get_user_by_topic(topic_id: int) -> Optional[int]:
-    async with aiosqlite.connect(DB_PATH) as conn:
+    async with reader() as conn:
         cur = await conn.execute('SELECT tg_user_id FROM user_topics WHERE topic_id = ?', (topic_id,))
         row = await cur.fetchone()
         return row[0] if row else None
 
+@db_call
 async def save_submission(tg_user_id: int, file_ids: List[str], caption: Optional[str]):
-    async with aiosqlite.connect(DB_PATH) as conn:
+    async with writer() as conn:
         await conn.execute(
             'INSERT INTO submissions (tg_user_id, file_ids, caption) VALUES (?, ?, ?)',
             (tg_user_id, ','.join(file_ids), caption or '')
         )
-        await conn.commit()
         cur = await conn.execute('SELECT last_insert_rowid()')
         row = await cur.fetchone()
         return row[0] if row else None
+
+@db_call
+async def create_broadcast(from_chat_id: Optional[int], message_id: Optional[int], text: Optional[str],
+                           report_chat_id: int, started_by: Optional[int]) -> int:
+    """Store a broadcast awaiting confirmation (a message to copy, or plain text); returns its id."""
+    async with writer() as conn:
+        cur = await conn.execute('''
+            INSERT INTO broadcasts (from_chat_id, message_id, text, report_chat_id, started_by, status)
+            VALUES (?, ?, ?, ?, ?, 'pending')
+        ''', (from_chat_id, message_id, text, report_chat_id, started_by))
+        return cur.lastrowid
+
+@db_call
+async def confirm_broadcast(broadcast_id: int) -> Optional[tuple]:
+    """Mark a pending broadcast running; returns its first nine get_running_broadcasts fields, or None."""
+    async with writer() as conn:
+        cur = await conn.execute('''
+            UPDATE broadcasts SET status = 'running', created_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'pending'
+            RETURNING id, from_chat_id, message_id, text, report_chat_id, last_user_id, delivered, blocked, failed
+        ''', (broadcast_id,))
+        return await cur.fetchone()
+
+@db_call
+async def get_running_broadcasts() -> List[tuple]:
+    """(id, from_chat_id, message_id, text, report_chat_id, last_user_id, delivered, blocked, failed, created_at)"""
+    async with reader() as conn:
+        cur = await conn.execute('''
+            SELECT id, from_chat_id, message_id, text, report_chat_id, last_user_id,
+                   delivered, blocked, failed, created_at
+            FROM broadcasts WHERE status = 'running' ORDER BY id
+        ''')
+        return await cur.fetchall()
+
+@db_call
+async def count_users() -> int:
+    async with reader() as conn:
+        cur = await conn.execute('SELECT COUNT(*) FROM users')
+        return (await cur.fetchone())[0]
+
+@db_call
+async def get_broadcast_recipients(after_user_id: int, limit: int) -> List[int]:
+    """Next page of user ids above after_user_id (keyset pagination on the primary key)."""
+    async with reader() as conn:
+        cur = await conn.execute(
+            'SELECT tg_user_id FROM users WHERE tg_user_id > ? ORDER BY tg_user_id LIMIT ?',
+            (after_user_id, limit)
+        )
+        return [row[0] for row in await cur.fetchall()]
+
+@db_call
+async def save_broadcast_progress(broadcast_id: int, last_user_id: int, delivered: int, blocked: int, failed: int,
+                                  status: str = "running") -> bool:
+    """Checkpoint a running broadcast; False if it is no longer running (e.g. cancelled)."""
+    async with writer() as conn:
+        cur = await conn.execute('''
+            UPDATE broadcasts SET last_user_id = ?, delivered = ?, blocked = ?, failed = ?, status = ?,
+                finished_at = CASE WHEN ? = 'running' THEN NULL ELSE CURRENT_TIMESTAMP END
+            WHERE id = ? AND status = 'running'
+        ''', (last_user_id, delivered, blocked, failed, status, status, broadcast_id))
+        return cur.rowcount == 1
+
+@db_call
+async def cancel_broadcast(broadcast_id: int) -> bool:
+    async with writer() as conn:
+        cur = await conn.execute(
+            "UPDATE broadcasts SET status = 'cancelled', finished_at = CURRENT_TIMESTAMP "
+            "WHERE id = ? AND status IN ('pending', 'running')",
+            (broadcast_id,)
+        )
+        return cur.rowcount == 1
+
+# Exportable tables: name -> (keyset column, exported columns). The keyset
+# column is the primary key, so each page is a single index range seek.
+EXPORT_TABLES: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "users": ("tg_user_id", ("tg_user_id", "username", "first_name", "created_at")),
+    "invite_links": ("invite_link", ("invite_link", "tg_user_id", "created_at", "active")),
+    "join_events": ("id", ("id", "invite_link", "joined_user_id", "joined_at")),
+    "submissions": ("id", ("id", "tg_user_id", "file_ids", "caption", "created_at", "staff_handled")),
+}
+
+async def iter_export_rows(table: str, batch_size: int = 5000) -> AsyncIterator[List[tuple]]:
+    """Yield all rows of an export table in pages, using keyset pagination.
+
+    A reader connection is borrowed per page only, so a long export never
+    pins one and memory stays at one page regardless of table size.
+    """
+    key, columns = EXPORT_TABLES[table]
+    key_pos = columns.index(key)
+    select = f'SELECT {", ".join(columns)} FROM {table}'
+    last = None
+    while True:
+        async with reader() as conn:
+            if last is None:
+                cur = await conn.execute(f'{select} ORDER BY {key} LIMIT ?', (batch_size,))
+            else:
+                cur = await conn.execute(f'{select} WHERE {key} > ? ORDER BY {key} LIMIT ?', (last, batch_size))
+            rows = await cur.fetchall()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        last = rows[-1][key_pos]
@@ -1,6 +1,7 @@
 from aiogram import Router, types
 from config import config
 from db.repository import ensure_user, get_user_join_count, get_rank
+from services.leaderboard import render_leaderboard
 
 router = Router()
 
@@ -18,6 +19,11 @@ async def cb_my_stats(query: types.CallbackQuery):
         await query.message.answer(text)
     await query.answer()
 
+@router.callback_query(lambda c: c.data == "top10")
+async def cb_top10(query: types.CallbackQuery):
+    await query.message.answer(await render_leaderboard(10))
+    await query.answer()
+
 @router.callback_query(lambda c: c.data == "contact_support")
 async def cb_contact(query: types.CallbackQuery):
     await query.message.answer("Send us your question or anything related to the challenge and staff will reply. Just send it as a normal message here.")
@@ -2,12 +2,123 @@ from aiogram import Router, types, F
 from aiogram.filters import Command
 import re
 import logging
+from typing import List, Union
 from config import config
-from db.repository import get_user_by_topic
+from db.repository import EXPORT_TABLES, rebuild_referral_counts, get_running_broadcasts
 from services.forwarding import forward_any
+from services.media_groups import media_groups
+from services.topics import get_user_for_topic
+from services.leaderboard import render_leaderboard
+from services.export import EXPORT_FORMATS, start_export
+from services.broadcast import broadcaster
 
 router = Router()
 
+@router.message(F.chat.id == config.STAFF_CHAT_ID, Command("broadcast"))
+async def broadcast(msg: types.Message):
+    parts = (msg.text or "").split(None, 1)
+    text = parts[1].strip() if len(parts) > 1 else ""
+    source = msg.reply_to_message
+    # In a forum every topic message replies to the topic's creation service message
+    if source is not None and (source.forum_topic_created or source.message_id == msg.message_thread_id):
+        source = None
+    if not text and source is None:
+        await msg.reply("Usage: reply to a message with /broadcast to send a copy to every user, or /broadcast <text>.\n"
+                        "See /broadcast_status and /broadcast_cancel <id>.")
+        return
+    try:
+        if text:
+            broadcast_id, recipients = await broadcaster.prepare(msg.chat.id, msg.from_user.id, text=text)
+        else:
+            broadcast_id, recipients = await broadcaster.prepare(msg.chat.id, msg.from_user.id,
+                                                                 from_chat_id=source.chat.id,
+                                                                 message_id=source.message_id)
+    except Exception as e:
+        logging.exception(f"Error preparing broadcast: {e}")
+        await msg.reply(f"❌ Could not prepare broadcast: {e}")
+        return
+    ikb = types.InlineKeyboardMarkup(inline_keyboard=[[
+        types.InlineKeyboardButton(text=f"✅ Send to {recipients} users", callback_data=f"broadcast_send:{broadcast_id}"),
+        types.InlineKeyboardButton(text="✖️ Cancel", callback_data=f"broadcast_drop:{broadcast_id}"),
+    ]])
+    await msg.reply(f"📣 Broadcast #{broadcast_id} will go to {recipients} users. Confirm?", reply_markup=ikb)
+
+@router.callback_query(F.message.chat.id == config.STAFF_CHAT_ID, F.data.startswith("broadcast_send:"))
+async def cb_broadcast_send(query: types.CallbackQuery):
+    broadcast_id = int(query.data.split(":", 1)[1])
+    try:
+        started = await broadcaster.confirm(query.bot, broadcast_id)
+    except Exception as e:
+        logging.exception(f"Error starting broadcast {broadcast_id}: {e}")
+        await query.answer(f"Could not start broadcast: {e}", show_alert=True)
+        return
+    if not started:
+        await query.answer("This broadcast was already started or cancelled.", show_alert=True)
+        return
+    await query.message.edit_text(f"📣 Broadcast #{broadcast_id} started. I'll report here when it is done.")
+    await query.answer()
+
+@router.callback_query(F.message.chat.id == config.STAFF_CHAT_ID, F.data.startswith("broadcast_drop:"))
+async def cb_broadcast_drop(query: types.CallbackQuery):
+    broadcast_id = int(query.data.split(":", 1)[1])
+    if await broadcaster.cancel(broadcast_id):
+        await query.message.edit_text(f"Broadcast #{broadcast_id} discarded.")
+    await query.answer()
+
+@router.message(F.chat.id == config.STAFF_CHAT_ID, Command("broadcast_status"))
+async def broadcast_status(msg: types.Message):
+    rows = await get_running_broadcasts()
+    if not rows:
+        await msg.reply("No broadcast is running.")
+        return
+    lines = []
+    for broadcast_id, _, _, _, _, last_user_id, delivered, blocked, failed, created_at in rows:
+        run = broadcaster.progress(broadcast_id)
+        if run is not None:
+            delivered, blocked, failed = run.delivered, run.blocked, run.failed
+        lines.append(f"#{broadcast_id} (since {created_at}): delivered {delivered}, blocked {blocked}, failed {failed}")
+    await msg.reply("\n".join(lines))
+
+@router.message(F.chat.id == config.STAFF_CHAT_ID, Command("broadcast_cancel"))
+async def broadcast_cancel(msg: types.Message):
+    parts = (msg.text or "").split()
+    if len(parts) < 2 or not parts[1].lstrip("#").isdigit():
+        await msg.reply("Usage: /broadcast_cancel <id>")
+        return
+    broadcast_id = int(parts[1].lstrip("#"))
+    if await broadcaster.cancel(broadcast_id):
+        await msg.reply(f"🛑 Broadcast #{broadcast_id} cancelled.")
+    else:
+        await msg.reply(f"Broadcast #{broadcast_id} is not running.")
+
+@router.message(F.chat.id == config.STAFF_CHAT_ID, Command("rebuild_counts"))
+async def rebuild_counts(msg: types.Message):
+    try:
+        referrers = await rebuild_referral_counts()
+        await msg.reply(f"✅ Rebuilt invite counters for {referrers} referrers.")
+    except Exception as e:
+        logging.exception(f"Error rebuilding referral counts: {e}")
+        await msg.reply(f"❌ Error rebuilding counters: {e}")
+
+@router.message(F.chat.id == config.STAFF_CHAT_ID, Command("export"))
+async def export(msg: types.Message):
+    parts = (msg.text or "").split()[1:]
+    fmt = parts.pop() if parts and parts[-1] in EXPORT_FORMATS else "csv"
+    tables = list(EXPORT_TABLES) if parts == ["all"] else parts
+    if not tables or any(t not in EXPORT_TABLES for t in tables):
+        await msg.reply(f"Usage: /export <{'|'.join(EXPORT_TABLES)}|all> [csv|jsonl]")
+        return
+    # Runs in the background: the export can take minutes and would hold up
+    # this staff member's other updates
+    start_export(msg.bot, msg.chat.id, tables, fmt, reply_to=msg.message_id)
+    await msg.reply(f"⏳ Exporting {', '.join(tables)} as {fmt}, the files will follow.")
+
+@router.message(F.chat.id == config.STAFF_CHAT_ID, Command("leaderboard"))
+async def leaderboard(msg: types.Message):
+    parts = (msg.text or "").split()
+    n = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 10
+    await msg.reply(await render_leaderboard(n, for_staff=True))
+
 @router.message(F.chat.id == config.STAFF_CHAT_ID)
 async def handle_staff_chat_messages(message: types.Message):
     if message.from_user and message.from_user.is_bot:
@@ -21,14 +132,24 @@ async def handle_staff_chat_messages(message: types.Message):
     if not topic_id:
         # Not in a topic; ignore in this handler
         return
-    
-    user_id = await get_user_by_topic(topic_id)
+
+    # Albums are collected and sent to the user in one go
+    if message.media_group_id:
+        await media_groups.add(message, _relay_to_user)
+        return
+    await media_groups.flush_sender(message)
+    await _relay_to_user(message)
+
+async def _relay_to_user(content: Union[types.Message, List[types.Message]]):
+    message = content[0] if isinstance(content, list) else content
+    topic_id = message.message_thread_id
+    user_id = await get_user_for_topic(topic_id)
     if not user_id:
         logging.warning(f"No user found for topic {topic_id}")
         return
     
     # Forward staff message to the specific user without any extra label
-    success = await forward_any(message.bot, message, user_id)
+    success = await forward_any(message.bot, content, user_id)
     if success:
         logging.info(f"Forwarded staff message from topic {topic_id} to user {user_id}")
     else:
@@ -73,7 +194,7 @@ async def handle_staff_replies(message: types.Message):
         return
     
     topic_id = message.message_thread_id
-    user_id = await get_user_by_topic(topic_id)
+    user_id = await get_user_for_topic(topic_id)
     if not user_id:
         logging.warning(f"No user found for topic {topic_id}")
         return
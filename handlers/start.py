@@ -2,9 +2,8 @@ from aiogram import Router, types
 from aiogram.filters import Command
 from config import config
 from db.repository import ensure_user, get_user_join_count, get_rank
-from services.invites import make_or_get_invite, build_share_url
-from services.forwarding import get_bot_link
-from keyboards.campaign import campaign_keyboard, main_menu_keyboard
+from services.invites import make_or_get_invite, get_share_message
+from keyboards.campaign import main_menu_keyboard
 import logging
 
 router = Router()
@@ -26,12 +25,9 @@ async def cmd_start(message: types.Message):
         total_invites = await get_user_join_count(tg_id)
         rank, total = await get_rank(tg_id)
         header = config.CAMPAIGN_HEADER.format(total_invites, f"{rank}/{total}" if rank else f"0/{total}")
-        composed = config.SHARE_BODY.replace("<INVITE_LINK>", invite_link)
         
-        # Build and send with keyboard
-        share_url = await build_share_url(message.bot, invite_link, composed)
-        bot_link = await get_bot_link(message.bot)
-        ikb = campaign_keyboard(share_url, bot_link)
+        # Share text and keyboard are cached per invite link
+        composed, ikb = await get_share_message(message.bot, invite_link)
         rkb = main_menu_keyboard()
         
         # Send the main message with inline actions, hide link preview to keep it concise
@@ -1,10 +1,12 @@
+from typing import List, Union
 from aiogram import Router, types, F
 from config import config
 from db.repository import ensure_user, get_user_join_count, get_rank
-from services.invites import make_or_get_invite, build_share_url
-from services.topics import get_or_create_user_topic
-from services.forwarding import forward_any, get_bot_link
-from keyboards.campaign import main_menu_keyboard, campaign_keyboard
+from services.invites import make_or_get_invite, get_share_message
+from services.topics import get_or_create_user_topic, forward_to_user_topic
+from services.forwarding import forward_any
+from services.media_groups import media_groups
+from services.leaderboard import render_leaderboard
 
 router = Router()
 
@@ -20,10 +22,7 @@ async def handle_user_messages(message: types.Message):
             if not invite_link:
                 await message.reply("Sorry, I couldn't create your personal invite link right now. Please try again in a minute.")
                 return
-            composed = config.SHARE_BODY.replace("<INVITE_LINK>", invite_link)
-            share_url = await build_share_url(message.bot, invite_link, composed)
-            bot_link = await get_bot_link(message.bot)
-            ikb = campaign_keyboard(share_url, bot_link)
+            _, ikb = await get_share_message(message.bot, invite_link)
             # Prompt to click the inline share button below (no extra confirmations)
             await message.reply("Click the Share to Group button below to share to your class groups.", reply_markup=ikb)
             return
@@ -35,6 +34,9 @@ async def handle_user_messages(message: types.Message):
             rank_text = f"{rank}/{total}" if rank else f"0/{total}"
             await message.reply(f"Your stats:\nTotal invited (via your link): {count}\nRank: {rank_text}")
             return
+        if text == "Top 10":
+            await message.reply(await render_leaderboard(10))
+            return
         if text == "Contact Support":
             await message.reply("Send your question or message here, and staff will reply.")
             return
@@ -46,22 +48,33 @@ async def handle_user_messages(message: types.Message):
     if message.text and message.text.startswith('/'):
         return
 
-    # Default: forward user content to staff (topic-specific if available)
+    # Default: forward user content to staff (topic-specific if available);
+    # album items are collected and relayed together
+    if message.media_group_id:
+        await media_groups.add(message, _relay_to_staff)
+        return
+    # An album sent just before this message reaches staff first
+    await media_groups.flush_sender(message)
+    await _relay_to_staff(message)
+
+async def _relay_to_staff(content: Union[types.Message, List[types.Message]]):
+    message = content[0] if isinstance(content, list) else content
     tg_id = message.from_user.id
     await ensure_user(tg_id, message.from_user.username, message.from_user.first_name)
 
     topic_id = await get_or_create_user_topic(message.bot, tg_id, message.from_user.username, message.from_user.first_name)
     if topic_id is None:
         # Could not create or access a topic; notify user and do not spam general chat
-        success = await forward_any(message.bot, message, config.STAFF_CHAT_ID, None, None)
+        success = await forward_any(message.bot, content, config.STAFF_CHAT_ID, None, None)
         if not success:
             await message.reply("⚠️ There was an error forwarding your message. Please try again or contact support.")
         else:
             await message.reply("⚠️ Topic creation failed; staff received your message but thread was not created.")
         return
 
-    # Forward into the user's topic only
-    success = await forward_any(message.bot, message, config.STAFF_CHAT_ID, None, topic_id)
+    # Forward into the user's topic only (recreated once if it was deleted)
+    success = await forward_to_user_topic(message.bot, content, tg_id, topic_id,
+                                          message.from_user.username, message.from_user.first_name)
 
     if not success:
         await message.reply("⚠️ There was an error forwarding your message. Please try again or contact support.")
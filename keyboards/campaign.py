@@ -11,18 +11,22 @@ def campaign_keyboard(share_url: str, bot_link: str) -> InlineKeyboardMarkup:
             [
                 InlineKeyboardButton(text="Submit Screenshot", callback_data="noop"),
                 InlineKeyboardButton(text="My Stats", callback_data="my_stats")
-            ]
+            ],
+            [InlineKeyboardButton(text="Top 10", callback_data="top10")]
         ]
     )
     return kb
 
-# Persistent chat menu (always visible at bottom, one tap away)
+# Persistent chat menu (always visible at bottom, one tap away); static, so built once
+_MAIN_MENU = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="Share to Group"), KeyboardButton(text="My Stats")],
+        [KeyboardButton(text="Contact Support"), KeyboardButton(text="Submit Screenshot")],
+        [KeyboardButton(text="Top 10")]
+    ],
+    resize_keyboard=True,
+    input_field_placeholder="Write a message..."
+)
+
 def main_menu_keyboard() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="Share to Group"), KeyboardButton(text="My Stats")],
-            [KeyboardButton(text="Contact Support"), KeyboardButton(text="Submit Screenshot")]
-        ],
-        resize_keyboard=True,
-        input_field_placeholder="Write a message..."
-    )
+    return _MAIN_MENU
@@ -7,26 +7,41 @@ from aiogram import F
 from urllib.parse import quote_plus
 from config import config
 from utils.logging import setup_logging
-from db.repository import init_db
+from db.connection import open_db, close_db
+from db.repository import init_db, flush_pending_users
 from services.invites import make_or_get_invite, build_share_url
 from services.topics import get_or_create_user_topic
 from services.forwarding import forward_any, get_bot_link
+from services import sender, metrics
+from services.join_digest import join_digest
+from services.media_groups import media_groups
+from services.join_pipeline import join_pipeline
+from services.invite_pool import invite_pool
+from services.broadcast import broadcaster
+from services.webhook import run_webhook
+from services.sharding import run_sharded
 from keyboards.campaign import campaign_keyboard
 from handlers import start, callbacks, user_messages, staff, join_requests, router as handlers_router
 
-# Setup logging
-setup_logging(config.DEBUG)
-
 dp = Dispatcher()
 
 # Include routers
 dp.include_router(handlers_router)
 
+ALLOWED_UPDATES = ["message", "callback_query", "chat_join_request"]
+
 async def on_startup(bot: Bot):
+    await open_db(config.DB_READERS)
     await init_db()
     logging.info("DB initialized")
+    # Joins spooled by shard workers of an earlier sharded run
+    join_pipeline.adopt_spools(join_pipeline.spool_path)
+    await join_pipeline.start(bot)
+    await invite_pool.start(bot)
+    await broadcaster.resume(bot)
+    await check_environment(bot)
 
-    # Environment checks
+async def check_environment(bot: Bot):
     try:
         me = await bot.get_me()
         logging.info(f"Bot @{me.username} (id={me.id}) connecting...")
@@ -52,12 +67,57 @@ async def on_startup(bot: Bot):
     except Exception:
         logging.exception("Startup environment check failed")
 
+async def on_shutdown(bot: Bot):
+    await broadcaster.stop()
+    await invite_pool.stop()
+    await join_pipeline.stop()
+    await media_groups.flush()
+    await join_digest.flush()
+    try:
+        await flush_pending_users()
+    except Exception:
+        logging.exception("Failed to flush pending users on shutdown")
+    await close_db()
+    logging.info("DB closed")
+
 if __name__ == "__main__":
+    # Only here: spawned shard workers re-import this module and log through the front
+    setup_logging(config.DEBUG)
+
     async def main():
         bot = Bot(token=config.BOT_TOKEN)
+        sharded = config.SHARD_WORKERS > 1
+        if not sharded:
+            sender.install(bot)
+        metrics_runner = None
+        if config.METRICS_PORT:
+            metrics.instrument(dp)
+            metrics.instrument_bot(bot)
+            metrics_runner = await metrics.serve(config.METRICS_HOST, config.METRICS_PORT)
+        if sharded:
+            # Front process: migrate once, then route updates to the workers
+            await open_db(1)
+            await init_db()
+            await close_db()
+            await check_environment(bot)
+            await run_sharded(bot, config.SHARD_WORKERS, ALLOWED_UPDATES)
+            await bot.session.close()
+            if metrics_runner:
+                await metrics_runner.cleanup()
+            return
         await on_startup(bot)
         bot_info = await bot.get_me()
         logging.info(f"Bot @{bot_info.username} started")
-        await dp.start_polling(bot, allowed_updates=["message", "callback_query", "chat_join_request"])
+        try:
+            if config.WEBHOOK_URL:
+                await run_webhook(dp, bot, ALLOWED_UPDATES)
+            else:
+                # A leftover webhook would make getUpdates fail with a conflict
+                await bot.delete_webhook()
+                await dp.start_polling(bot, allowed_updates=ALLOWED_UPDATES)
+        finally:
+            await on_shutdown(bot)
+            if metrics_runner:
+                await metrics_runner.cleanup()
     
     asyncio.run(main())
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Tuple
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from config import config
+from db.repository import (create_broadcast, confirm_broadcast, count_users, get_running_broadcasts,
+                           get_broadcast_recipients, save_broadcast_progress, cancel_broadcast,
+                           flush_pending_users)
+from services.sender import PRIORITY_BULK, send_priority
+
+class _Run:
+    """Progress of one broadcast in this process."""
+
+    def __init__(self, broadcast_id: int, from_chat_id: Optional[int], message_id: Optional[int],
+                 text: Optional[str], report_chat_id: int, last_user_id: int = 0,
+                 delivered: int = 0, blocked: int = 0, failed: int = 0):
+        self.id = broadcast_id
+        self.from_chat_id = from_chat_id
+        self.message_id = message_id
+        self.text = text
+        self.report_chat_id = report_chat_id
+        self.delivered = delivered
+        self.blocked = blocked
+        self.failed = failed
+        self.started = time.monotonic()
+        self.sent_at_start = delivered + blocked + failed
+        # Recipients handed out but not finished, in dispatch order: user id ->
+        # the id dispatched just before it
+        self.pending: Dict[int, int] = {}
+        self.last_dispatched = last_user_id
+
+    @property
+    def checkpoint(self) -> int:
+        """Highest user id such that it and every id below it are finished."""
+        if self.pending:
+            return next(iter(self.pending.values()))
+        return self.last_dispatched
+
+    def summary(self) -> str:
+        return f"delivered {self.delivered}, blocked {self.blocked}, failed {self.failed}"
+
+
+class Broadcaster:
+    """Sends one staff message to every user, resumably.
+
+    Recipients are read from users in keyset pages and sent by `concurrency`
+    workers at BULK priority, so the send scheduler holds the global rate and
+    retry-after pauses while user replies still go first. Progress is
+    checkpointed every CHECKPOINT_INTERVAL seconds and running broadcasts are
+    resumed on start; the recipients right after the last checkpoint may get
+    the message twice after a crash.
+    """
+
+    CHECKPOINT_INTERVAL = 5.0
+
+    def __init__(self, concurrency: int = 30, page_size: int = 1000):
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self._runs: Dict[int, _Run] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    async def prepare(self, report_chat_id: int, started_by: Optional[int], from_chat_id: Optional[int] = None,
+                      message_id: Optional[int] = None, text: Optional[str] = None) -> Tuple[int, int]:
+        """Store a broadcast of a message copy (or plain text) awaiting confirmation; returns (id, recipients)."""
+        # Users still in the write-behind buffer are recipients too
+        await flush_pending_users()
+        recipients = await count_users()
+        broadcast_id = await create_broadcast(from_chat_id, message_id, text, report_chat_id, started_by)
+        return broadcast_id, recipients
+
+    async def confirm(self, bot: Bot, broadcast_id: int) -> bool:
+        """Start a prepared broadcast; False if it was already started or cancelled."""
+        row = await confirm_broadcast(broadcast_id)
+        if row is None:
+            return False
+        self._spawn(bot, _Run(*row))
+        return True
+
+    async def resume(self, bot: Bot) -> int:
+        """Continue broadcasts interrupted by a restart; returns how many."""
+        resumed = 0
+        for row in await get_running_broadcasts():
+            if row[0] not in self._tasks:
+                self._spawn(bot, _Run(*row[:9]))
+                logging.info(f"Resuming broadcast {row[0]} after user {row[5]}")
+                resumed += 1
+        return resumed
+
+    async def cancel(self, broadcast_id: int) -> bool:
+        cancelled = await cancel_broadcast(broadcast_id)
+        task = self._tasks.get(broadcast_id)
+        if task is not None:
+            task.cancel()
+        return cancelled
+
+    async def stop(self) -> None:
+        """Stop all broadcasts, checkpointing them so the next start resumes."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def progress(self, broadcast_id: int) -> Optional[_Run]:
+        return self._runs.get(broadcast_id)
+
+    def _spawn(self, bot: Bot, run: _Run) -> None:
+        self._runs[run.id] = run
+        task = asyncio.create_task(self._run(bot, run))
+        self._tasks[run.id] = task
+
+        def forget(_):
+            self._tasks.pop(run.id, None)
+            self._runs.pop(run.id, None)
+        task.add_done_callback(forget)
+
+    async def _run(self, bot: Bot, run: _Run) -> None:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        workers = [asyncio.create_task(self._work(bot, run, queue)) for _ in range(self.concurrency)]
+        checkpoints = asyncio.create_task(self._checkpoint_loop(run))
+        status = "running"
+        try:
+            cursor = run.last_dispatched
+            while page := await get_broadcast_recipients(cursor, self.page_size):
+                for user_id in page:
+                    run.pending[user_id] = run.last_dispatched
+                    run.last_dispatched = user_id
+                    await queue.put(user_id)
+                cursor = page[-1]
+            await queue.join()
+            status = "done"
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logging.exception(f"Broadcast {run.id} stopped: {e}")
+        finally:
+            for task in workers + [checkpoints]:
+                task.cancel()
+            await asyncio.gather(*workers, checkpoints, return_exceptions=True)
+            try:
+                saved = await save_broadcast_progress(run.id, run.checkpoint, run.delivered, run.blocked,
+                                                      run.failed, status)
+            except Exception as e:
+                logging.exception(f"Could not checkpoint broadcast {run.id}: {e}")
+                saved = False
+        if status == "done" or not saved:
+            await self._report(bot, run, "finished" if status == "done" else "cancelled")
+
+    async def _checkpoint_loop(self, run: _Run) -> None:
+        while True:
+            await asyncio.sleep(self.CHECKPOINT_INTERVAL)
+            try:
+                running = await save_broadcast_progress(run.id, run.checkpoint, run.delivered, run.blocked, run.failed)
+            except Exception as e:
+                logging.warning(f"Could not checkpoint broadcast {run.id}: {e}")
+                continue
+            if not running:
+                # Cancelled, possibly from another process
+                self._tasks[run.id].cancel()
+                return
+
+    async def _work(self, bot: Bot, run: _Run, queue: asyncio.Queue) -> None:
+        while True:
+            user_id = await queue.get()
+            try:
+                await self._send(bot, run, user_id)
+                # Left pending if cancelled mid-send, so a resume sends it again
+                run.pending.pop(user_id, None)
+            finally:
+                queue.task_done()
+
+    async def _send(self, bot: Bot, run: _Run, user_id: int) -> None:
+        try:
+            with send_priority(PRIORITY_BULK):
+                if run.text is not None:
+                    await bot.send_message(user_id, run.text)
+                else:
+                    await bot.copy_message(user_id, run.from_chat_id, run.message_id)
+            run.delivered += 1
+        except TelegramForbiddenError:
+            # Blocked the bot or deactivated
+            run.blocked += 1
+        except TelegramBadRequest as e:
+            if "chat not found" in str(e).lower():
+                run.blocked += 1
+            else:
+                run.failed += 1
+                logging.debug(f"Broadcast {run.id} to {user_id} failed: {e}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            run.failed += 1
+            logging.debug(f"Broadcast {run.id} to {user_id} failed: {type(e).__name__} {e}")
+
+    async def _report(self, bot: Bot, run: _Run, outcome: str) -> None:
+        elapsed = time.monotonic() - run.started
+        sent = run.delivered + run.blocked + run.failed - run.sent_at_start
+        rate = f", {sent / elapsed:.1f}/s" if elapsed > 0 else ""
+        try:
+            await bot.send_message(run.report_chat_id,
+                                   f"📣 Broadcast #{run.id} {outcome} in {elapsed / 60:.1f} min{rate}: {run.summary()}")
+        except Exception as e:
+            logging.warning(f"Could not report broadcast {run.id}: {e}")
+
+broadcaster = Broadcaster(config.BROADCAST_CONCURRENCY, config.BROADCAST_PAGE_SIZE)
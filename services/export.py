@@ -0,0 +1,95 @@
+import asyncio
+import csv
+import gzip
+import json
+import logging
+import os
+import tempfile
+from typing import List, Optional, Sequence, Set, Tuple
+from aiogram import Bot
+from aiogram.types import FSInputFile
+from db.repository import EXPORT_TABLES, iter_export_rows
+
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_BATCH_SIZE = 5000
+# Bot API upload limit for documents
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+# One export at a time; each one walks a whole table
+_export_lock = asyncio.Lock()
+# Running /export jobs, kept referenced until they finish
+_background: Set[asyncio.Task] = set()
+
+def _write_rows(fh, fmt: str, columns: Sequence[str], rows: Sequence[tuple]) -> None:
+    if fmt == "csv":
+        csv.writer(fh).writerows(rows)
+    else:
+        fh.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows)
+
+async def export_table(table: str, fmt: str = "csv") -> Tuple[str, int]:
+    """Dump a table to a gzipped temp file page by page; returns (path, rows).
+
+    Formatting and compression run in a worker thread so the event loop
+    keeps serving updates; only one page is held in memory at a time.
+    """
+    _, columns = EXPORT_TABLES[table]
+    fd, path = tempfile.mkstemp(prefix=f"{table}_", suffix=f".{fmt}.gz")
+    os.close(fd)
+    total = 0
+    try:
+        fh = await asyncio.to_thread(gzip.open, path, "wt", encoding="utf-8", newline="")
+        try:
+            if fmt == "csv":
+                await asyncio.to_thread(csv.writer(fh).writerow, columns)
+            async for rows in iter_export_rows(table, EXPORT_BATCH_SIZE):
+                await asyncio.to_thread(_write_rows, fh, fmt, columns, rows)
+                total += len(rows)
+        finally:
+            await asyncio.to_thread(fh.close)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, total
+
+async def send_export(bot: Bot, chat_id: int, table: str, fmt: str = "csv", reply_to: Optional[int] = None) -> int:
+    """Export a table and upload it to chat_id as a document; returns the row count."""
+    async with _export_lock:
+        path, total = await export_table(table, fmt)
+    try:
+        size = os.path.getsize(path)
+        if size > MAX_UPLOAD_BYTES:
+            raise ValueError(f"{table} export is {size // (1024 * 1024)} MB, over the 50 MB upload limit")
+        await bot.send_document(
+            chat_id,
+            FSInputFile(path, filename=f"{table}.{fmt}.gz"),
+            caption=f"{table}: {total} rows",
+            reply_to_message_id=reply_to,
+        )
+        logging.info(f"Exported {total} rows of {table} as {fmt}")
+        return total
+    finally:
+        os.remove(path)
+
+async def _send_exports(bot: Bot, chat_id: int, tables: List[str], fmt: str, reply_to: Optional[int]) -> None:
+    done = []
+    for table in tables:
+        try:
+            await send_export(bot, chat_id, table, fmt, reply_to=reply_to)
+            done.append(table)
+        except Exception as e:
+            logging.exception(f"Error exporting {table}: {e}")
+            try:
+                await bot.send_message(chat_id, f"❌ Export of {table} failed: {e}", reply_to_message_id=reply_to)
+            except Exception as e:
+                logging.warning(f"Could not report failed export of {table}: {e}")
+    try:
+        await bot.send_message(chat_id, f"✅ Export finished: {len(done)} of {len(tables)} tables.",
+                               reply_to_message_id=reply_to)
+    except Exception as e:
+        logging.warning(f"Could not report finished export: {e}")
+
+def start_export(bot: Bot, chat_id: int, tables: List[str], fmt: str = "csv", reply_to: Optional[int] = None) -> None:
+    """Export and upload tables in the background, so the caller's handler returns at once."""
+    task = asyncio.create_task(_send_exports(bot, chat_id, tables, fmt, reply_to))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
@@ -1,9 +1,14 @@
 import asyncio
-from typing import Optional
+from typing import List, Optional, Union
 from aiogram import Bot
-from aiogram.types import Message
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import (Message, MessageEntity, InputMediaAudio, InputMediaDocument, InputMediaPhoto,
+                           InputMediaVideo)
 import logging
 
+# Telegram caps an album at 10 items
+ALBUM_MAX_ITEMS = 10
+
 # Simple in-process cache for bot link
 _BOT_LINK: Optional[str] = None
 
@@ -20,60 +25,120 @@ async def get_bot_link(bot: Bot) -> str:
         logging.exception("Failed to get bot link")
         return ""
 
-async def forward_any(bot: Bot, message: Message, target_chat_id: int, prefix: Optional[str] = None, thread_id: Optional[int] = None) -> bool:
-    """Generic function to forward any message content to a target chat"""
+async def forward_any(bot: Bot, message: Union[Message, List[Message]], target_chat_id: int, prefix: Optional[str] = None, thread_id: Optional[int] = None) -> bool:
+    """Generic function to forward any message content (or a collected album) to a target chat"""
     try:
-        user_info = ""
-        if prefix:
-            user_info = f"{prefix}\n\n"
-
-        # Handle different message types
-        if message.text:
-            text_content = f"{user_info}{message.text}"
-            await bot.send_message(target_chat_id, text_content, message_thread_id=thread_id)
-        elif message.photo:
-            caption = f"{user_info}{message.caption}" if message.caption else user_info
-            await bot.send_photo(target_chat_id, message.photo[-1].file_id, caption=caption, message_thread_id=thread_id)
-        elif message.video:
-            caption = f"{user_info}{message.caption}" if message.caption else user_info
-            await bot.send_video(target_chat_id, message.video.file_id, caption=caption, message_thread_id=thread_id)
-        elif message.voice:
-            caption = f"{user_info}{message.caption}" if message.caption else user_info
-            await bot.send_voice(target_chat_id, message.voice.file_id, caption=caption, message_thread_id=thread_id)
-        elif message.audio:
-            caption = f"{user_info}{message.caption}" if message.caption else user_info
-            await bot.send_audio(target_chat_id, message.audio.file_id, caption=caption, message_thread_id=thread_id)
-        elif message.document:
-            caption = f"{user_info}{message.caption}" if message.caption else user_info
-            await bot.send_document(target_chat_id, message.document.file_id, caption=caption, message_thread_id=thread_id)
-        elif message.animation:
-            caption = f"{user_info}{message.caption}" if message.caption else user_info
-            await bot.send_animation(target_chat_id, message.animation.file_id, caption=caption, message_thread_id=thread_id)
-        elif message.sticker:
-            await bot.send_message(target_chat_id, f"{user_info}[Sent a sticker]", message_thread_id=thread_id)
-            await bot.send_sticker(target_chat_id, message.sticker.file_id, message_thread_id=thread_id)
-        elif message.video_note:
-            await bot.send_message(target_chat_id, f"{user_info}[Sent a video note]", message_thread_id=thread_id)
-            await bot.send_video_note(target_chat_id, message.video_note.file_id, message_thread_id=thread_id)
-        elif message.contact:
-            await bot.send_contact(target_chat_id, phone_number=message.contact.phone_number,
-                                   first_name=message.contact.first_name, last_name=message.contact.last_name,
-                                   message_thread_id=thread_id)
-            await bot.send_message(target_chat_id, f"{user_info}[Sent a contact]", message_thread_id=thread_id)
-        elif message.location:
-            await bot.send_location(target_chat_id, latitude=message.location.latitude,
-                                    longitude=message.location.longitude, message_thread_id=thread_id)
-            await bot.send_message(target_chat_id, f"{user_info}[Sent a location]", message_thread_id=thread_id)
-        elif message.forward_from or message.forward_from_chat:
-            try:
-                await message.forward(target_chat_id, message_thread_id=thread_id)
-                await bot.send_message(target_chat_id, f"{user_info}[Forwarded message]", message_thread_id=thread_id)
-            except Exception as e:
-                logging.warning(f"Could not forward message: {e}")
-                await bot.send_message(target_chat_id, f"{user_info}[Could not forward message - content may be protected]", message_thread_id=thread_id)
-        else:
-            await bot.send_message(target_chat_id, f"{user_info}[Sent unsupported content type]", message_thread_id=thread_id)
+        await send_any(bot, message, target_chat_id, prefix, thread_id)
         return True
     except Exception as e:
         logging.exception(f"Error forwarding message: {e}")
         return False
+
+# Content types whose copy carries a caption, so a prefix can ride along in it
+_CAPTIONED = ("photo", "video", "animation", "audio", "document", "voice")
+CAPTION_LIMIT = 1024
+TEXT_LIMIT = 4096
+
+def _utf16_len(text: str) -> int:
+    # Entity offsets and text/caption limits are counted in UTF-16 code units
+    return len(text.encode("utf-16-le")) // 2
+
+def _shift(entities: Optional[List[MessageEntity]], by: int) -> Optional[List[MessageEntity]]:
+    if not entities:
+        return None
+    return [e.model_copy(update={"offset": e.offset + by}) for e in entities]
+
+def _cannot_relay(e: Exception) -> bool:
+    # Protected content, or a message kind Telegram refuses to copy
+    msg = str(e).lower()
+    return isinstance(e, TelegramBadRequest) and ("can't be copied" in msg or "can't be forwarded" in msg)
+
+async def send_any(bot: Bot, message: Union[Message, List[Message]], target_chat_id: int, prefix: Optional[str] = None, thread_id: Optional[int] = None) -> None:
+    """Like forward_any, but lets Telegram errors propagate to the caller.
+
+    One Bot API call per message for every content type: copy_message, with
+    the prefix injected into the caption where the type has one (or into the
+    text via send_message). Forwards keep their origin via forward_message. A
+    separate header message is only sent for a prefix that cannot be injected
+    (stickers, polls, locations, ... or an over-long caption).
+    """
+    if isinstance(message, list):
+        await send_album(bot, message, target_chat_id, prefix, thread_id)
+        return
+    header = f"{prefix}\n\n" if prefix else ""
+    if message.forward_origin:
+        if header:
+            await bot.send_message(target_chat_id, f"{header}[Forwarded message]", message_thread_id=thread_id)
+        try:
+            await bot.forward_message(target_chat_id, message.chat.id, message.message_id, message_thread_id=thread_id)
+        except TelegramBadRequest as e:
+            if not _cannot_relay(e):
+                raise
+            logging.warning(f"Could not forward message: {e}")
+            await bot.send_message(target_chat_id, f"{header}[Could not forward message - content may be protected]",
+                                   message_thread_id=thread_id)
+        return
+
+    copy = {}
+    if header and message.text is not None and _utf16_len(header) + _utf16_len(message.text) <= TEXT_LIMIT:
+        await bot.send_message(target_chat_id, header + message.text, message_thread_id=thread_id,
+                               entities=_shift(message.entities, _utf16_len(header)))
+        return
+    if header and (message.content_type in _CAPTIONED
+                   and _utf16_len(header) + _utf16_len(message.caption or "") <= CAPTION_LIMIT):
+        copy = {"caption": header + (message.caption or ""),
+                "caption_entities": _shift(message.caption_entities, _utf16_len(header))}
+    elif header:
+        await bot.send_message(target_chat_id, prefix, message_thread_id=thread_id)
+    try:
+        await bot.copy_message(target_chat_id, message.chat.id, message.message_id, message_thread_id=thread_id, **copy)
+    except TelegramBadRequest as e:
+        if not _cannot_relay(e):
+            raise
+        # Service messages, invoices, giveaways, quizzes with unknown answer
+        logging.warning(f"Could not copy {message.content_type} message: {e}")
+        await bot.send_message(target_chat_id, f"{header}[Sent unsupported content type: {message.content_type}]",
+                               message_thread_id=thread_id)
+
+def _album_item(message: Message, caption: Optional[str], caption_entities: Optional[List[MessageEntity]] = None):
+    fields = {"caption": caption, "caption_entities": caption_entities}
+    if message.photo:
+        return InputMediaPhoto(media=message.photo[-1].file_id, **fields)
+    if message.video:
+        return InputMediaVideo(media=message.video.file_id, **fields)
+    if message.document:
+        return InputMediaDocument(media=message.document.file_id, **fields)
+    if message.audio:
+        return InputMediaAudio(media=message.audio.file_id, **fields)
+    return None
+
+async def send_album(bot: Bot, messages: List[Message], target_chat_id: int, prefix: Optional[str] = None, thread_id: Optional[int] = None) -> None:
+    """Relay an album in one call: copy_messages, or send_media_group when a prefix goes in the caption"""
+    if not prefix:
+        # copy_messages keeps the items grouped and works for every album type
+        await bot.copy_messages(target_chat_id, messages[0].chat.id, [m.message_id for m in messages],
+                                message_thread_id=thread_id)
+        return
+    # Items that cannot go in a media group are relayed on their own
+    groupable = [m for m in messages if _album_item(m, None) is not None]
+    loose = [m for m in messages if m not in groupable]
+    for i, message in enumerate(loose):
+        await send_any(bot, message, target_chat_id, prefix if i == 0 and not groupable else None, thread_id)
+    for start in range(0, len(groupable), ALBUM_MAX_ITEMS):
+        chunk = groupable[start:start + ALBUM_MAX_ITEMS]
+        chunk_prefix = prefix if start == 0 else None
+        if len(chunk) == 1:
+            # send_media_group needs at least two items
+            await send_any(bot, chunk[0], target_chat_id, chunk_prefix, thread_id)
+            continue
+        media = []
+        for message in chunk:
+            caption, entities = message.caption, message.caption_entities
+            if chunk_prefix and not media:
+                header = f"{chunk_prefix}\n\n" if caption else chunk_prefix
+                if _utf16_len(header) + _utf16_len(caption or "") <= CAPTION_LIMIT:
+                    caption, entities = header + (caption or ""), _shift(entities, _utf16_len(header))
+                else:
+                    await bot.send_message(target_chat_id, chunk_prefix, message_thread_id=thread_id)
+            media.append(_album_item(message, caption, entities))
+        await bot.send_media_group(target_chat_id, media, message_thread_id=thread_id)
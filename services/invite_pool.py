@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import secrets
+from typing import Optional, Set
+from aiogram import Bot
+from config import config
+from db.repository import add_pooled_invite, count_pooled_invites
+
+class InvitePool:
+    """Keeps a stock of pre-created invite links so /start never waits on the API.
+
+    Whenever fewer than `low_water` unassigned links are pooled, the minter
+    tops the pool up to `high_water`. Claimed links are renamed to
+    user_<id> in the background, which keeps them recognisable in the
+    channel's link list and in the staff join digest.
+    """
+
+    MINT_PAUSE = 0.2
+    ERROR_BACKOFF = 60
+
+    def __init__(self, low_water: int = 50, high_water: int = 200):
+        self.low_water = low_water
+        self.high_water = high_water
+        self._bot: Optional[Bot] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._background: Set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.high_water > 0
+
+    async def start(self, bot: Bot) -> None:
+        if not self.enabled or self._task is not None:
+            return
+        self._bot = bot
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._mint_loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def claimed(self, bot: Bot, invite_link: str, tg_user_id: int) -> None:
+        """Label a freshly claimed link and let the minter check the stock."""
+        task = asyncio.create_task(self._label(bot, invite_link, tg_user_id))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _label(self, bot: Bot, invite_link: str, tg_user_id: int) -> None:
+        try:
+            await bot.edit_chat_invite_link(
+                chat_id=config.CHANNEL_ID,
+                invite_link=invite_link,
+                name=f"user_{tg_user_id}",
+                creates_join_request=config.JOIN_REQUESTS_ENABLED,
+            )
+        except Exception as e:
+            logging.debug(f"Could not rename pooled invite link for {tg_user_id}: {e}")
+
+    async def _mint_loop(self) -> None:
+        while True:
+            try:
+                stock = await count_pooled_invites(config.JOIN_REQUESTS_ENABLED)
+                if stock < self.low_water:
+                    minted = 0
+                    for _ in range(self.high_water - stock):
+                        await self._mint_one()
+                        minted += 1
+                        await asyncio.sleep(self.MINT_PAUSE)
+                    logging.info(f"Invite pool refilled with {minted} links")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"Invite pool refill failed: {e}")
+                await asyncio.sleep(self.ERROR_BACKOFF)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=60)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _mint_one(self) -> None:
+        params = {
+            "chat_id": config.CHANNEL_ID,
+            "name": f"pool_{secrets.token_hex(4)}",
+        }
+        if config.JOIN_REQUESTS_ENABLED:
+            params["creates_join_request"] = True
+        res = await self._bot.create_chat_invite_link(**params)
+        await add_pooled_invite(res.invite_link, config.JOIN_REQUESTS_ENABLED)
+
+invite_pool = InvitePool(config.INVITE_POOL_LOW, config.INVITE_POOL_HIGH)
@@ -1,15 +1,35 @@
+from typing import List, Tuple
 from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup
 from config import config
-from db.repository import get_invite_by_user, save_invite_link
+from db.repository import get_invite_by_user, save_invite_link, claim_pooled_invite
 import logging
 from urllib.parse import quote_plus
 from services.forwarding import get_bot_link
+from services.invite_pool import invite_pool
+from utils.singleflight import SingleFlight
+from utils.cache import LRUCache, MISSING
+from keyboards.campaign import campaign_keyboard
+
+# Concurrent /start and "Share to Group" for one user share a single creation
+_invite_flights = SingleFlight()
 
 async def make_or_get_invite(bot: Bot, tg_user_id: int, user_fullname: str) -> str:
+    return await _invite_flights.do(tg_user_id, lambda: _make_or_get_invite(bot, tg_user_id))
+
+async def _make_or_get_invite(bot: Bot, tg_user_id: int) -> str:
     link = await get_invite_by_user(tg_user_id)
     if link:
         return link
 
+    # Fast path: take a pre-minted link from the pool (a single DB transaction)
+    if invite_pool.enabled:
+        link, claimed = await claim_pooled_invite(tg_user_id, config.JOIN_REQUESTS_ENABLED)
+        if claimed:
+            invite_pool.claimed(bot, link, tg_user_id)
+        if link:
+            return link
+
     try:
         # Always try to create a unique invite link
         params = {
@@ -34,3 +54,39 @@ async def build_share_url(bot: Bot, invite_link: str, share_text: str) -> str:
         body += f"\n\nParticipate in a challenge: {bot_link}"
     u = f"https://t.me/share/url?text={quote_plus(body)}"
     return u
+
+SHARE_CACHE_SIZE = 1000
+
+# (invite_link, SHARE_BODY version, bot_link) -> (share text, inline keyboard)
+_share_cache = LRUCache(SHARE_CACHE_SIZE)
+# (SHARE_BODY version, bot_link) -> text pieces around <INVITE_LINK>, plain and URL-encoded
+_share_templates = LRUCache(4)
+
+def _share_template(body_version: int, bot_link: str) -> Tuple[List[str], List[str]]:
+    template = _share_templates.get((body_version, bot_link))
+    if template is MISSING:
+        text_parts = config.SHARE_BODY.split("<INVITE_LINK>")
+        url_body = config.SHARE_BODY
+        if bot_link:
+            url_body += f"\n\nParticipate in a challenge: {bot_link}"
+        # quote_plus works per character, so encoding the pieces once and
+        # joining them with the encoded link equals encoding the whole text
+        url_parts = [quote_plus(part) for part in url_body.split("<INVITE_LINK>")]
+        template = (text_parts, url_parts)
+        _share_templates.put((body_version, bot_link), template)
+    return template
+
+async def get_share_message(bot: Bot, invite_link: str) -> Tuple[str, InlineKeyboardMarkup]:
+    """Share text with the user's link plus the campaign keyboard, memoized per link."""
+    bot_link = await get_bot_link(bot)
+    # str caches its hash, so this is O(1) after the first call
+    key = (invite_link, hash(config.SHARE_BODY), bot_link)
+    cached = _share_cache.get(key)
+    if cached is not MISSING:
+        return cached
+    text_parts, url_parts = _share_template(key[1], bot_link)
+    composed = invite_link.join(text_parts)
+    share_url = "https://t.me/share/url?text=" + quote_plus(invite_link).join(url_parts)
+    result = (composed, campaign_keyboard(share_url, bot_link))
+    _share_cache.put(key, result)
+    return result
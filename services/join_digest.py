@@ -0,0 +1,59 @@
+import asyncio
+import logging
+from collections import Counter
+from typing import Optional
+from aiogram import Bot
+from config import config
+
+class JoinDigest:
+    """Buffers recorded joins and posts one summary to the staff chat.
+
+    A digest goes out every `interval` seconds, or as soon as `max_joins`
+    joins are waiting, so join handling never waits on staff-chat sends.
+    """
+
+    MAX_LINES = 20
+
+    def __init__(self, interval: float = 30, max_joins: int = 50):
+        self.interval = interval
+        self.max_joins = max_joins
+        self._joins = 0
+        self._by_referrer: Counter = Counter()
+        self._bot: Optional[Bot] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._flushing: Optional[asyncio.Task] = None
+
+    def add(self, bot: Bot, referrer: str) -> None:
+        self._bot = bot
+        self._joins += 1
+        self._by_referrer[referrer] += 1
+        if self._joins >= self.max_joins:
+            if self._flushing is None or self._flushing.done():
+                self._flushing = asyncio.create_task(self.flush())
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.interval)
+        await self.flush()
+
+    def _render(self, joins: int, by_referrer: Counter) -> str:
+        lines = [f"✅ {joins} new join(s) via bot invite links. Auto-approved."]
+        top = by_referrer.most_common(self.MAX_LINES)
+        for referrer, count in top:
+            lines.append(f"• {referrer}: {count}")
+        if len(by_referrer) > len(top):
+            lines.append(f"…and {len(by_referrer) - len(top)} more referrers")
+        return "\n".join(lines)
+
+    async def flush(self) -> None:
+        if not self._joins or self._bot is None:
+            return
+        joins, by_referrer = self._joins, self._by_referrer
+        self._joins, self._by_referrer = 0, Counter()
+        try:
+            await self._bot.send_message(config.STAFF_CHAT_ID, self._render(joins, by_referrer))
+        except Exception as e:
+            logging.debug(f"Could not send join digest to staff: {e}")
+
+join_digest = JoinDigest(config.JOIN_DIGEST_INTERVAL, config.JOIN_DIGEST_MAX)
@@ -0,0 +1,170 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import re
+from typing import List, Optional, Tuple
+from aiogram import Bot
+from config import config
+from db.invite_index import invite_index
+from db.repository import record_tracked_join
+from services.join_digest import join_digest
+
+# Spool files next to the base path: optional shard index, optional .replay
+_SPOOL_SUFFIX = re.compile(r"(?:\.(\d+))?(?:\.replay)?")
+
+# (invite_link, joined_user_id, link_name)
+JoinItem = Tuple[str, int, Optional[str]]
+
+class JoinPipeline:
+    """Approves join requests immediately and records them in the background.
+
+    Stage 1 approves under its own concurrency limit. Stage 2 records the
+    join from a bounded queue; when the queue is full, or on shutdown,
+    pending joins are appended to a JSONL spool file that is replayed on
+    the next start. Stage 3 is the staff digest. Recording is idempotent,
+    so replaying a join twice is harmless.
+    """
+
+    def __init__(self, approve_concurrency: int = 20, queue_size: int = 10000, spool_path: str = "join_spool.jsonl"):
+        self.approve_concurrency = approve_concurrency
+        self.queue_size = queue_size
+        self.spool_path = spool_path
+        self._approve_limit: Optional[asyncio.Semaphore] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._bot: Optional[Bot] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._replay: Optional[asyncio.Task] = None
+        self._current: Optional[JoinItem] = None
+        self.spooled = 0
+
+    async def start(self, bot: Bot) -> None:
+        self._bot = bot
+        self._approve_limit = asyncio.Semaphore(self.approve_concurrency)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._worker = asyncio.create_task(self._record_loop())
+        self._replay = asyncio.create_task(self._replay_spool())
+
+    async def stop(self) -> None:
+        """Stop the workers and spool everything that was not recorded yet."""
+        if self._queue is None:
+            return
+        pending: List[JoinItem] = []
+        for task in (self._replay, self._worker):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        if self._current is not None:
+            pending.append(self._current)
+            self._current = None
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        if pending:
+            self._spool(pending)
+            logging.info(f"Spooled {len(pending)} unrecorded joins to {self.spool_path}")
+        self._queue = None
+
+    async def drain(self) -> None:
+        """Wait until the spool replay is done and every queued join is recorded."""
+        if self._queue is None:
+            return
+        if self._replay is not None:
+            await self._replay
+        await self._queue.join()
+
+    async def submit(self, bot: Bot, joined_user_id: int, invite_link: Optional[str], link_name: Optional[str]) -> None:
+        if self._queue is None:
+            await self.start(bot)
+        # Stage 1: approve; always, even if recording is backed up or fails
+        async with self._approve_limit:
+            try:
+                await bot.approve_chat_join_request(chat_id=config.CHANNEL_ID, user_id=joined_user_id)
+            except Exception as approve_err:
+                logging.exception("Failed to approve join request: %s", approve_err)
+                # Do not return; still attempt to record join for stats
+        # Links not created by this bot are rejected without a DB round trip
+        if not invite_link or invite_link not in invite_index:
+            return
+        item = (invite_link, joined_user_id, link_name)
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self._spool([item])
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _spool(self, items: List[JoinItem]) -> None:
+        with open(self.spool_path, "a", encoding="utf-8") as f:
+            for item in items:
+                f.write(json.dumps(item) + "\n")
+        self.spooled += len(items)
+
+    def adopt_spools(self, base_path: str, live_workers: int = 0) -> int:
+        """Append joins spooled by other runs under base_path to our own spool; returns how many.
+
+        Picks up the single-process spool, per-worker spools (base_path.N) and
+        interrupted replays (.replay) of either, except our own files and those
+        of live shard workers (N < live_workers).
+        """
+        own = {self.spool_path, self.spool_path + ".replay"}
+        adopted = 0
+        for path in sorted([base_path] + glob.glob(glob.escape(base_path) + ".*")):
+            match = _SPOOL_SUFFIX.fullmatch(path[len(base_path):])
+            if path in own or match is None or not os.path.exists(path):
+                continue
+            if match.group(1) is not None and int(match.group(1)) < live_workers:
+                continue
+            with open(path, encoding="utf-8") as src:
+                lines = [line for line in src if line.strip()]
+            with open(self.spool_path, "a", encoding="utf-8") as dst:
+                dst.writelines(lines)
+            os.remove(path)
+            adopted += len(lines)
+        if adopted:
+            logging.info(f"Adopted {adopted} spooled joins into {self.spool_path}")
+        return adopted
+
+    async def _replay_spool(self) -> None:
+        replay_path = self.spool_path + ".replay"
+        if os.path.exists(self.spool_path):
+            if os.path.exists(replay_path):
+                # Leftover from an interrupted replay; keep both
+                with open(self.spool_path, encoding="utf-8") as src, open(replay_path, "a", encoding="utf-8") as dst:
+                    dst.write(src.read())
+                os.remove(self.spool_path)
+            else:
+                os.replace(self.spool_path, replay_path)
+        if not os.path.exists(replay_path):
+            return
+        with open(replay_path, encoding="utf-8") as f:
+            items = [tuple(json.loads(line)) for line in f if line.strip()]
+        logging.info(f"Replaying {len(items)} spooled joins")
+        for i, item in enumerate(items):
+            try:
+                # Waits for room in the queue: replay never overflows it
+                await self._queue.put(item)
+            except asyncio.CancelledError:
+                self._spool(items[i:])
+                os.remove(replay_path)
+                raise
+        os.remove(replay_path)
+
+    async def _record_loop(self) -> None:
+        while True:
+            self._current = await self._queue.get()
+            invite_link, joined_user_id, link_name = self._current
+            try:
+                # Stage 2: stats; stage 3: staff digest
+                if await record_tracked_join(invite_link, joined_user_id):
+                    join_digest.add(self._bot, link_name or invite_link)
+            except Exception as e:
+                logging.exception("Error recording join for %s: %s", joined_user_id, e)
+            self._current = None
+            self._queue.task_done()
+
+join_pipeline = JoinPipeline(config.JOIN_APPROVE_CONCURRENCY, config.JOIN_QUEUE_SIZE, config.JOIN_SPOOL_PATH)
@@ -0,0 +1,35 @@
+from typing import Dict, Tuple
+from db.ranking import rank_index
+from db.repository import load_rank_index, get_user_names
+
+MAX_ENTRIES = 100
+
+# (n, for_staff) -> (top-n snapshot, rendered text); reused until the top n changes
+_rendered: Dict[Tuple[int, bool], Tuple[tuple, str]] = {}
+
+async def render_leaderboard(n: int = 10, for_staff: bool = False) -> str:
+    """Top-n referrers as text. Users see first names only; staff also get @username and ID."""
+    n = max(1, min(n, MAX_ENTRIES))
+    if not rank_index.loaded:
+        await load_rank_index()
+    # Invite owners without a join yet are ranked too; they are not referrers
+    top = tuple(entry for entry in rank_index.top(n) if entry[1] > 0)
+    cached = _rendered.get((n, for_staff))
+    if cached and cached[0] == top:
+        return cached[1]
+
+    if not top:
+        text = "No referrals yet. Be the first to share your link!"
+    else:
+        names = await get_user_names([tg_user_id for tg_user_id, _ in top])
+        lines = [f"🏆 Top {len(top)} referrers"]
+        for position, (tg_user_id, joins) in enumerate(top, start=1):
+            username, first_name = names.get(tg_user_id, (None, None))
+            if for_staff:
+                who = f"{first_name or 'User'} (@{username or 'unknown'}, ID: {tg_user_id})"
+            else:
+                who = first_name or "Participant"
+            lines.append(f"{position}. {who} — {joins}")
+        text = "\n".join(lines)
+    _rendered[(n, for_staff)] = (top, text)
+    return text
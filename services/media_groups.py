@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Tuple
+from aiogram.types import Message
+from config import config
+
+Deliver = Callable[[List[Message]], Awaitable]
+
+class MediaGroupBuffer:
+    """Collects the items of an album (shared media_group_id) and relays them together.
+
+    Telegram delivers every album item as its own update, milliseconds apart.
+    Albums are buffered per sender: the first item starts a `window`-second
+    timer that restarts on each later item, and when it fires the whole album
+    goes to `deliver` in one call. A sender's next album or non-album message
+    (see flush_sender) relays the pending one first, so their messages keep
+    their order. `backlog(sender_id)` reports whether more of the sender's
+    updates are already queued (sharded workers); the timer waits for those,
+    as they may be further items of the same album.
+    """
+
+    def __init__(self, window: float = 1.0):
+        self.window = window
+        self.backlog: Callable[[int], bool] = lambda sender_id: False
+        # sender id -> (media_group_id, items so far, deliver)
+        self._albums: Dict[int, Tuple[str, List[Message], Deliver]] = {}
+        self._deadlines: Dict[int, float] = {}
+        # sender id -> task waiting out the window, then relaying the album
+        self._timers: Dict[int, asyncio.Task] = {}
+
+    @staticmethod
+    def _sender(message: Message) -> int:
+        return message.from_user.id if message.from_user else message.chat.id
+
+    async def add(self, message: Message, deliver: Deliver) -> None:
+        key = self._sender(message)
+        album = self._albums.get(key)
+        if album is not None and album[0] == message.media_group_id:
+            album[1].append(message)
+            self._deadlines[key] = asyncio.get_running_loop().time() + self.window
+            return
+        # A previous album from this sender goes out first
+        await self._flush(key)
+        self._albums[key] = (message.media_group_id, [message], deliver)
+        self._deadlines[key] = asyncio.get_running_loop().time() + self.window
+        task = asyncio.create_task(self._deliver_later(key))
+        self._timers[key] = task
+        task.add_done_callback(lambda t: self._timers.pop(key) if self._timers.get(key) is t else None)
+
+    async def flush_sender(self, message: Message) -> None:
+        """Relay the sender's pending album now, before their next message is relayed."""
+        await self._flush(self._sender(message))
+
+    async def flush(self) -> None:
+        """Relay every buffered album now (used on shutdown)."""
+        for key in list(self._timers):
+            await self._flush(key)
+
+    async def _flush(self, key: int) -> None:
+        task = self._timers.get(key)
+        if task is None:
+            return
+        if key in self._albums:
+            # Still waiting out the window
+            task.cancel()
+            self._timers.pop(key, None)
+            await self._deliver(key)
+        else:
+            # Already being relayed
+            await asyncio.shield(task)
+
+    async def _deliver_later(self, key: int) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            wait = self._deadlines[key] - loop.time()
+            if wait <= 0:
+                if not self.backlog(key):
+                    break
+                wait = self.window
+                self._deadlines[key] = loop.time() + wait
+            await asyncio.sleep(wait)
+        await self._deliver(key)
+
+    async def _deliver(self, key: int) -> None:
+        media_group_id, messages, deliver = self._albums.pop(key)
+        del self._deadlines[key]
+        messages.sort(key=lambda m: m.message_id)
+        try:
+            await deliver(messages)
+        except Exception as e:
+            logging.exception(f"Error relaying album {media_group_id} from {key}: {e}")
+
+media_groups = MediaGroupBuffer(config.MEDIA_GROUP_WINDOW)
@@ -0,0 +1,99 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from aiohttp import web
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from db.repository import pending_user_count
+from services.join_pipeline import join_pipeline
+from services.sender import scheduler
+from utils.metrics import registry
+
+# Handler and Bot API instrumentation plus the /metrics endpoint. Repository
+# calls are timed in db/repository.py; queue depths are read at scrape time.
+
+HANDLER_SECONDS = registry.histogram("bot_handler_seconds", "Update handler latency by handler", "handler")
+HANDLER_ERRORS = registry.counter("bot_handler_errors_total", "Update handlers that raised, by handler", "handler")
+API_SECONDS = registry.histogram("bot_api_request_seconds", "Bot API request latency by method", "method")
+API_ERRORS = registry.counter("bot_api_errors_total", "Failed Bot API requests by method", "method")
+API_RETRY_AFTER = registry.counter("bot_api_retry_after_total", "Bot API 429 (retry after) responses by method", "method")
+
+registry.gauge("bot_send_scheduler", "Outbound send scheduler state (queued by priority, totals)",
+               scheduler.stats, "stat")
+registry.gauge("bot_join_queue_depth", "Join requests approved but not yet recorded", join_pipeline.depth)
+registry.gauge("bot_pending_users", "Buffered user upserts not yet flushed", pending_user_count)
+
+_handler_names: Dict[Callable, str] = {}
+
+def _handler_name(data: Dict[str, Any]) -> str:
+    handler = data.get("handler")
+    callback = getattr(handler, "callback", None)
+    if callback is None:
+        return "unhandled"
+    name = _handler_names.get(callback)
+    if name is None:
+        name = _handler_names[callback] = f"{callback.__module__.rsplit('.', 1)[-1]}.{callback.__name__}"
+    return name
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware timing each handler that actually runs."""
+
+    async def __call__(self, handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]], event: Any,
+                      data: Dict[str, Any]) -> Any:
+        name = _handler_name(data)
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(name, time.perf_counter() - start)
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Counts and times every Bot API request attempt (retries included)."""
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod):
+        name = method.__api_method__
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter:
+            API_RETRY_AFTER.inc(name)
+            API_ERRORS.inc(name)
+            raise
+        except Exception:
+            API_ERRORS.inc(name)
+            raise
+        finally:
+            API_SECONDS.observe(name, time.perf_counter() - start)
+
+def instrument(dp: Dispatcher) -> None:
+    """Time every message, callback query and join request handler."""
+    for observer in (dp.message, dp.callback_query, dp.chat_join_request):
+        observer.middleware(HandlerMetricsMiddleware())
+
+def instrument_bot(bot: Bot) -> None:
+    """Record Bot API calls; install after sender.install so each retry is seen."""
+    bot.session.middleware(ApiMetricsMiddleware())
+
+async def _handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8",
+                        headers={"X-Content-Type-Options": "nosniff"})
+
+async def serve(host: str, port: int) -> Optional[web.AppRunner]:
+    """Serve GET /metrics in Prometheus text format; returns the runner to clean up."""
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        logging.error(f"Metrics endpoint could not bind {host}:{port}: {e}")
+        await runner.cleanup()
+        return None
+    logging.info(f"Metrics on http://{host}:{port}/metrics")
+    return runner
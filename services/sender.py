@@ -0,0 +1,236 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+
+from config import config
+
+# Priority classes, lower is served first
+PRIORITY_USER = 0   # replies in private chats
+PRIORITY_STAFF = 1  # forwards and notifications into the staff chat
+PRIORITY_BULK = 2   # mass sends that may wait behind everything else
+
+_priority_override: ContextVar[Optional[int]] = ContextVar("send_priority", default=None)
+
+# Methods that count against Telegram's message limits; everything else
+# (getUpdates, approveChatJoinRequest, ...) is only covered by retry-after handling
+_PACED_PREFIXES = ("send", "copyMessage", "forwardMessage", "editMessage")
+
+@contextmanager
+def send_priority(priority: int):
+    """Run the enclosed Bot API calls with an explicit priority class."""
+    token = _priority_override.set(priority)
+    try:
+        yield
+    finally:
+        _priority_override.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, self.paused_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    @property
+    def idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity and self.paused_until <= time.monotonic()
+
+
+class SendScheduler:
+    """Paces outbound Bot API calls with per-chat and global token buckets.
+
+    Callers first wait on their chat's bucket (which keeps per-chat order),
+    then on the global bucket, where waiters are released by priority class.
+    """
+
+    MAX_IDLE_CHATS = 10000
+
+    def __init__(self, global_rate: float = 30, private_rate: float = 1, group_per_minute: float = 20,
+                 max_retries: int = 3):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.private_rate = private_rate
+        self.group_rate = group_per_minute / 60
+        self.max_retries = max_retries
+        self._chats: Dict[object, Tuple[TokenBucket, asyncio.Lock]] = {}
+        self._chat_waiters = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.retry_after_hits = 0
+
+    def _chat(self, chat_id) -> Tuple[TokenBucket, asyncio.Lock]:
+        entry = self._chats.get(chat_id)
+        if entry is None:
+            if len(self._chats) >= self.MAX_IDLE_CHATS:
+                self._prune()
+            if isinstance(chat_id, int) and chat_id > 0:
+                bucket = TokenBucket(self.private_rate, 3)
+            else:
+                bucket = TokenBucket(self.group_rate, 3)
+            entry = (bucket, asyncio.Lock())
+            self._chats[chat_id] = entry
+        return entry
+
+    def _prune(self) -> None:
+        for chat_id, (bucket, lock) in list(self._chats.items()):
+            if bucket.idle and not lock.locked():
+                del self._chats[chat_id]
+
+    async def acquire(self, chat_id, priority: int) -> None:
+        bucket, lock = self._chat(chat_id)
+        self._chat_waiters += 1
+        try:
+            async with lock:
+                while (wait := bucket.delay()) > 0:
+                    await asyncio.sleep(wait)
+                bucket.take()
+                await self._acquire_global(priority)
+        finally:
+            self._chat_waiters -= 1
+
+    async def _acquire_global(self, priority: int) -> None:
+        if not self._waiters and self.global_bucket.delay() == 0:
+            self.global_bucket.take()
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await fut
+
+    async def _dispatch(self) -> None:
+        while self._waiters:
+            wait = self.global_bucket.delay()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, fut = heapq.heappop(self._waiters)
+            if fut.done():
+                continue
+            self.global_bucket.take()
+            fut.set_result(None)
+
+    def share(self, processes: int) -> None:
+        """Split the global and group limits across this many sender processes.
+
+        Private chats keep their own rate: each user is served by one process.
+        """
+        self.global_bucket = TokenBucket(self.global_bucket.rate / processes, max(1.0, self.global_bucket.capacity / processes))
+        self.group_rate /= processes
+        self._chats.clear()
+
+    def pause(self, chat_id, seconds: float) -> None:
+        """Stop sending to chat_id (or to everyone if chat_id is None) for a while."""
+        if chat_id is None:
+            self.global_bucket.pause(seconds)
+        else:
+            self._chat(chat_id)[0].pause(seconds)
+
+    def stats(self) -> Dict[str, int]:
+        depth = {"user": 0, "staff": 0, "bulk": 0}
+        names = {PRIORITY_USER: "user", PRIORITY_STAFF: "staff", PRIORITY_BULK: "bulk"}
+        for priority, _, fut in self._waiters:
+            if not fut.done():
+                depth[names.get(priority, "bulk")] += 1
+        return {
+            "queued_user": depth["user"],
+            "queued_staff": depth["staff"],
+            "queued_bulk": depth["bulk"],
+            "waiting_on_chat": self._chat_waiters,
+            "tracked_chats": len(self._chats),
+            "sent": self.sent,
+            "retry_after": self.retry_after_hits,
+        }
+
+
+def _priority_for(chat_id) -> int:
+    override = _priority_override.get()
+    if override is not None:
+        return override
+    if chat_id == config.STAFF_CHAT_ID:
+        return PRIORITY_STAFF
+    if isinstance(chat_id, int) and chat_id > 0:
+        return PRIORITY_USER
+    return PRIORITY_STAFF
+
+
+class SendSchedulerMiddleware(BaseRequestMiddleware):
+    """Routes every Bot API request through the scheduler and retries on 429.
+
+    A 429 pauses the chat's bucket; on a bulk send it pauses the global one too.
+    """
+
+    def __init__(self, scheduler: SendScheduler):
+        self.scheduler = scheduler
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod):
+        api_method = method.__api_method__
+        chat_id = getattr(method, "chat_id", None)
+        paced = chat_id is not None and api_method.startswith(_PACED_PREFIXES)
+        priority = _priority_for(chat_id) if paced else None
+        attempt = 0
+        while True:
+            if paced:
+                await self.scheduler.acquire(chat_id, priority)
+            try:
+                result = await make_request(bot, method)
+                if paced:
+                    self.scheduler.sent += 1
+                return result
+            except TelegramRetryAfter as e:
+                self.scheduler.retry_after_hits += 1
+                attempt += 1
+                self.scheduler.pause(chat_id, e.retry_after)
+                if priority == PRIORITY_BULK:
+                    # A flood wait during mass sends applies to the whole bot
+                    self.scheduler.pause(None, e.retry_after)
+                if attempt > self.scheduler.max_retries:
+                    raise
+                logging.warning(f"Flood control on {api_method} (chat {chat_id}), retrying in {e.retry_after}s")
+                if not paced:
+                    await asyncio.sleep(e.retry_after)
+
+
+scheduler = SendScheduler(
+    global_rate=config.SEND_GLOBAL_RATE,
+    private_rate=config.SEND_PRIVATE_RATE,
+    group_per_minute=config.SEND_GROUP_PER_MINUTE,
+    max_retries=config.SEND_MAX_RETRIES,
+)
+
+def install(bot: Bot) -> None:
+    """Attach the shared scheduler to a bot's session."""
+    bot.session.middleware(SendSchedulerMiddleware(scheduler))
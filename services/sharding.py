@@ -0,0 +1,299 @@
+import asyncio
+import json
+import logging
+import multiprocessing as mp
+import signal
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from config import config
+from db.connection import open_db, close_db
+from db.invite_index import invite_index
+from db.ranking import rank_index
+from db.repository import cache_listeners, load_caches, load_rank_index, flush_pending_users
+from utils.metrics import registry
+from handlers import router as handlers_router
+from services import sender, metrics
+from services.join_digest import join_digest
+from services.media_groups import media_groups
+from services.join_pipeline import join_pipeline
+from services.invite_pool import invite_pool
+from services.broadcast import broadcaster
+from services.webhook import run_webhook
+from utils.logging import setup_logging, serve_queue, stop_logging
+
+# Sharded mode: one front process receives raw update JSON (long polling or
+# webhook) and routes it by user id to SHARD_WORKERS worker processes, each
+# running the normal handlers. A user always lands on the same worker, and
+# each worker runs one user's updates strictly in order.
+
+def shard_key(update: dict) -> int:
+    """User id an update belongs to (chat id as a fallback, 0 if neither)."""
+    for payload in update.values():
+        if isinstance(payload, dict):
+            user = payload.get("from")
+            if user:
+                return user["id"]
+            chat = payload.get("chat")
+            if chat:
+                return chat["id"]
+    return 0
+
+
+class KeyedSerial:
+    """Runs jobs concurrently across keys but strictly in order per key."""
+
+    def __init__(self, concurrency: int = 100, backlog: int = 1000):
+        self._slots = asyncio.Semaphore(concurrency)
+        self._backlog = backlog
+        self._queues: Dict[int, Deque[Callable[[], Awaitable]]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._pending = 0
+        self._room = asyncio.Event()
+        self._room.set()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def submit(self, key: int, job: Callable[[], Awaitable]) -> None:
+        self._pending += 1
+        if self._pending >= self._backlog:
+            self._room.clear()
+        queue = self._queues.get(key)
+        if queue is not None:
+            queue.append(job)
+            return
+        self._queues[key] = deque([job])
+        task = asyncio.create_task(self._run(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def queued(self, key: int) -> int:
+        """Jobs for key that are waiting (not counting the one running)."""
+        queue = self._queues.get(key)
+        return len(queue) if queue else 0
+
+    async def wait_for_room(self) -> None:
+        await self._room.wait()
+
+    async def _run(self, key: int) -> None:
+        queue = self._queues[key]
+        while queue:
+            job = queue.popleft()
+            async with self._slots:
+                try:
+                    await job()
+                except Exception as e:
+                    logging.exception(f"Error processing update for {key}: {e}")
+            self._pending -= 1
+            if self._pending < self._backlog:
+                self._room.set()
+        del self._queues[key]
+
+    async def drain(self) -> None:
+        while self._tasks:
+            await asyncio.wait(set(self._tasks))
+
+
+def _dispatcher() -> Dispatcher:
+    # main.py builds its dispatcher at import time and spawn re-imports it in
+    # each worker; reuse that one rather than attaching the router twice
+    parent = handlers_router.parent_router
+    if isinstance(parent, Dispatcher):
+        return parent
+    dp = Dispatcher()
+    dp.include_router(handlers_router)
+    return dp
+
+
+def _apply_event(event: str, args: tuple, background: Set[asyncio.Task]) -> None:
+    """Mirror an index change made by another worker."""
+    if event == "invite_saved":
+        invite_link, tg_user_id = args
+        invite_index.add(invite_link)
+        rank_index.add(tg_user_id)
+    elif event == "join_recorded":
+        rank_index.increment(args[0])
+    elif event == "rank_reloaded":
+        task = asyncio.create_task(load_rank_index())
+        background.add(task)
+        task.add_done_callback(background.discard)
+
+
+async def _worker(index: int, workers: int, inbox, events, api: TelegramAPIServer) -> None:
+    bot = Bot(token=config.BOT_TOKEN, session=AiohttpSession(api=api))
+    sender.scheduler.share(workers)
+    sender.install(bot)
+    base_spool = join_pipeline.spool_path
+    join_pipeline.spool_path = f"{base_spool}.{index}"
+    if index == 0:
+        # Joins spooled by single-process mode or by shards that no longer exist
+        join_pipeline.adopt_spools(base_spool, workers)
+
+    await open_db(config.DB_READERS)
+    await load_caches()
+    cache_listeners.append(lambda event, *args: events.put((index, event, args)))
+    await join_pipeline.start(bot)
+    if index == 0:
+        # One minter is enough; every worker claims from the shared pool
+        await invite_pool.start(bot)
+        await broadcaster.resume(bot)
+    dp = _dispatcher()
+    serial = KeyedSerial(config.SHARD_WORKER_CONCURRENCY)
+    # Hold an album back while more of the sender's updates wait for a slot
+    media_groups.backlog = lambda sender_id: serial.queued(sender_id) > 0
+    metrics_runner = None
+    if config.METRICS_PORT:
+        metrics.instrument(dp)
+        metrics.instrument_bot(bot)
+        registry.gauge("bot_shard_pending_updates", "Updates received by this worker but not yet handled",
+                       lambda: serial.pending)
+        metrics_runner = await metrics.serve(config.METRICS_HOST, config.METRICS_PORT + 1 + index)
+    background: Set[asyncio.Task] = set()
+    loop = asyncio.get_running_loop()
+    events.put((index, "ready", ()))
+
+    while True:
+        await serial.wait_for_room()
+        msg = await loop.run_in_executor(None, inbox.get)
+        if msg[0] == "stop":
+            break
+        if msg[0] == "event":
+            _apply_event(msg[1], msg[2], background)
+            continue
+        for update in msg[1]:
+            serial.submit(shard_key(update), lambda update=update: dp.feed_raw_update(bot, update))
+
+    await serial.drain()
+    await broadcaster.stop()
+    await invite_pool.stop()
+    await join_pipeline.stop()
+    await media_groups.flush()
+    await join_digest.flush()
+    try:
+        await flush_pending_users()
+    except Exception:
+        logging.exception("Failed to flush pending users on shutdown")
+    await close_db()
+    await bot.session.close()
+    if metrics_runner:
+        await metrics_runner.cleanup()
+    logging.info(f"Shard worker {index} stopped")
+
+
+def _worker_main(index: int, workers: int, inbox, events, api: TelegramAPIServer, log_queue) -> None:
+    # Records go to the front process, which owns the log file and its rotation
+    setup_logging(config.DEBUG, queue=log_queue)
+    # The front process coordinates shutdown; ignore Ctrl-C sent to the group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_worker(index, workers, inbox, events, api))
+
+
+async def _poll_raw(bot: Bot, allowed_updates: List[str], route: Callable[[List[dict]], None]) -> None:
+    """getUpdates loop that hands over raw JSON, skipping model parsing."""
+    url = bot.session.api.api_url(token=bot.token, method="getUpdates")
+    offset: Optional[int] = None
+    async with aiohttp.ClientSession() as http:
+        while True:
+            params = {"timeout": 30, "allowed_updates": json.dumps(allowed_updates)}
+            if offset is not None:
+                params["offset"] = offset
+            try:
+                async with http.get(url, params=params, timeout=aiohttp.ClientTimeout(total=40)) as resp:
+                    payload = await resp.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logging.warning(f"getUpdates failed: {e}")
+                await asyncio.sleep(1)
+                continue
+            if not payload.get("ok"):
+                retry_after = (payload.get("parameters") or {}).get("retry_after", 1)
+                logging.warning(f"getUpdates error: {payload.get('description')}")
+                await asyncio.sleep(retry_after)
+                continue
+            updates = payload["result"]
+            if updates:
+                offset = updates[-1]["update_id"] + 1
+                route(updates)
+
+
+async def run_sharded(bot: Bot, workers: int, allowed_updates: List[str]) -> None:
+    """Run the front process and `workers` worker processes until stopped."""
+    ctx = mp.get_context("spawn")
+    events = ctx.Queue()
+    log_queue = ctx.Queue()
+    serve_queue(log_queue)
+    inboxes = [ctx.Queue() for _ in range(workers)]
+    procs = [
+        ctx.Process(target=_worker_main, args=(i, workers, inboxes[i], events, bot.session.api, log_queue),
+                    name=f"shard-{i}")
+        for i in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+
+    loop = asyncio.get_running_loop()
+    all_ready = asyncio.Event()
+
+    async def relay_events():
+        ready = 0
+        while True:
+            item = await loop.run_in_executor(None, events.get)
+            if item is None:
+                return
+            source, event, args = item
+            if event == "ready":
+                ready += 1
+                if ready == workers:
+                    all_ready.set()
+                continue
+            for i, inbox in enumerate(inboxes):
+                if i != source:
+                    inbox.put(("event", event, args))
+
+    def route(updates: List[dict]) -> None:
+        batches: Dict[int, List[dict]] = {}
+        for update in updates:
+            batches.setdefault(shard_key(update) % workers, []).append(update)
+        for shard, batch in batches.items():
+            inboxes[shard].put(("updates", batch))
+
+    async def feed(update: dict) -> None:
+        route([update])
+
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+    relay = asyncio.create_task(relay_events())
+    try:
+        waiter = asyncio.create_task(stop.wait())
+        await asyncio.wait([asyncio.create_task(all_ready.wait()), waiter], return_when=asyncio.FIRST_COMPLETED)
+        if not stop.is_set():
+            waiter.cancel()
+            logging.info(f"Sharded mode: {workers} workers ready")
+            if config.WEBHOOK_URL:
+                await run_webhook(None, bot, allowed_updates, feed=feed)
+            else:
+                await bot.delete_webhook()
+                poller = asyncio.create_task(_poll_raw(bot, allowed_updates, route))
+                await stop.wait()
+                poller.cancel()
+    finally:
+        for inbox in inboxes:
+            inbox.put(("stop",))
+        for proc in procs:
+            await loop.run_in_executor(None, proc.join, config.WEBHOOK_DRAIN_TIMEOUT)
+            if proc.is_alive():
+                logging.warning(f"{proc.name} did not stop in time, terminating")
+                proc.terminate()
+        events.put(None)
+        await relay
+        stop_logging(log_queue)
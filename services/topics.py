@@ -1,25 +1,67 @@
+from typing import Optional
 from aiogram import Bot
+from aiogram.types import Message
 from config import config
-from db.repository import get_user_topic, save_user_topic
+from db.repository import get_user_topic, save_user_topic, get_user_by_topic
+from services.forwarding import send_any, forward_any
+from utils.cache import LRUCache, MISSING
+from utils.singleflight import SingleFlight
 import logging
 from aiogram.exceptions import TelegramBadRequest
 
-async def get_or_create_user_topic(bot: Bot, tg_user_id: int, username: str = None, first_name: str = None) -> int:
-    existing_topic_id = await get_user_topic(tg_user_id)
-    if existing_topic_id:
-        try:
-            # Probe existing topic; if works, reuse
-            probe = await bot.send_message(config.STAFF_CHAT_ID, "\u2063", message_thread_id=existing_topic_id)
-            try:
-                await bot.delete_message(config.STAFF_CHAT_ID, probe.message_id)
-            except Exception:
-                pass
+TOPIC_CACHE_SIZE = 10000
+
+# tg_user_id -> topic_id, and topic_id -> tg_user_id (None = topic with no user)
+_topic_by_user = LRUCache(TOPIC_CACHE_SIZE)
+_user_by_topic = LRUCache(TOPIC_CACHE_SIZE)
+# Concurrent messages from one user share a single topic lookup/creation
+_topic_flights = SingleFlight()
+
+def _remember(tg_user_id: int, topic_id: int):
+    _topic_by_user.put(tg_user_id, topic_id)
+    _user_by_topic.put(topic_id, tg_user_id)
+
+def invalidate_user_topic(tg_user_id: int):
+    topic_id = _topic_by_user.pop(tg_user_id)
+    if topic_id is not None:
+        _user_by_topic.put(topic_id, None)
+
+def is_topic_missing_error(e: Exception) -> bool:
+    msg = str(e).lower()
+    return isinstance(e, TelegramBadRequest) and (
+        "thread not found" in msg or "topic_deleted" in msg or "topic_id_invalid" in msg
+    )
+
+async def get_user_for_topic(topic_id: int) -> Optional[int]:
+    """Resolve the user behind a staff topic, caching misses as well as hits."""
+    cached = _user_by_topic.get(topic_id)
+    if cached is not MISSING:
+        return cached
+    tg_user_id = await get_user_by_topic(topic_id)
+    _user_by_topic.put(topic_id, tg_user_id)
+    if tg_user_id is not None:
+        _topic_by_user.put(tg_user_id, topic_id)
+    return tg_user_id
+
+async def get_or_create_user_topic(bot: Bot, tg_user_id: int, username: str = None, first_name: str = None,
+                                   recreate: bool = False) -> int:
+    if not recreate:
+        cached = _topic_by_user.get(tg_user_id)
+        if cached is not MISSING:
+            return cached
+    # A recreate must not join a lookup already in flight: that one returns the stored, deleted topic
+    return await _topic_flights.do(
+        (tg_user_id, recreate), lambda: _get_or_create_user_topic(bot, tg_user_id, username, first_name, recreate)
+    )
+
+async def _get_or_create_user_topic(bot: Bot, tg_user_id: int, username: str, first_name: str,
+                                    recreate: bool) -> int:
+    if not recreate:
+        # Trust the stored topic; it is only replaced when a real forward fails
+        existing_topic_id = await get_user_topic(tg_user_id)
+        if existing_topic_id:
+            _remember(tg_user_id, existing_topic_id)
             return existing_topic_id
-        except TelegramBadRequest:
-            logging.warning(f"Topic {existing_topic_id} deleted for user {tg_user_id}, will recreate.")
-        except Exception as e:
-            logging.warning(f"Error probing topic {existing_topic_id}: {e}. Will recreate.")
-    # Create new topic (only after probe fails)
     topic_name = f"{first_name or 'User'} (@{username})" if username else f"User {tg_user_id}"
     if len(topic_name) > 128:
         topic_name = topic_name[:125] + "..."
@@ -27,8 +69,31 @@ async def get_or_create_user_topic(bot: Bot, tg_user_id: int, username: str = No
         result = await bot.create_forum_topic(chat_id=config.STAFF_CHAT_ID, name=topic_name)
         topic_id = result.message_thread_id
         await save_user_topic(tg_user_id, topic_id, topic_name)
+        _remember(tg_user_id, topic_id)
         logging.info(f"Created new topic {topic_id} for user {tg_user_id}")
         return topic_id
     except Exception as e:
         logging.warning(f"Failed to create forum topic for user {tg_user_id}: {e}")
         return None
+
+async def forward_to_user_topic(bot: Bot, message: Message, tg_user_id: int, topic_id: int,
+                                username: str = None, first_name: str = None) -> bool:
+    """Forward into the user's topic, recreating it once if Telegram reports it gone."""
+    try:
+        await send_any(bot, message, config.STAFF_CHAT_ID, None, topic_id)
+        return True
+    except Exception as e:
+        if not is_topic_missing_error(e):
+            logging.exception(f"Error forwarding message: {e}")
+            return False
+        logging.warning(f"Topic {topic_id} deleted for user {tg_user_id}, will recreate.")
+    current = _topic_by_user.get(tg_user_id)
+    if current is not MISSING and current != topic_id:
+        # A concurrent forward already replaced the topic
+        new_topic_id = current
+    else:
+        invalidate_user_topic(tg_user_id)
+        new_topic_id = await get_or_create_user_topic(bot, tg_user_id, username, first_name, recreate=True)
+    if new_topic_id is None:
+        return False
+    return await forward_any(bot, message, config.STAFF_CHAT_ID, None, new_topic_id)
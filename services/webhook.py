@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import secrets
+import signal
+from typing import Awaitable, Callable, List, Optional, Set
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from config import config
+from utils.metrics import registry
+
+class WebhookServer:
+    """Receives updates over HTTP and feeds them to the dispatcher.
+
+    Each update is acknowledged as soon as a handler slot is free and then
+    processed in the background; at most `concurrency` updates run at once,
+    and further requests wait for a slot (so Telegram backs off too).
+    On shutdown the server stops accepting requests and drains in-flight
+    updates for up to `drain_timeout` seconds.
+    """
+
+    def __init__(self, dp: Optional[Dispatcher], bot: Bot, secret_token: Optional[str] = None,
+                 concurrency: int = 100, drain_timeout: float = 30,
+                 feed: Optional[Callable[[dict], Awaitable]] = None):
+        self.dp = dp
+        self.bot = bot
+        # Where raw update JSON goes; the sharded front routes it to workers instead
+        self.feed = feed or (lambda data: self.dp.feed_raw_update(self.bot, data))
+        # Every request must carry the secret; without one configured a random
+        # one is used (run_webhook registers it with Telegram)
+        self.secret_token = secret_token or secrets.token_urlsafe(32)
+        self.drain_timeout = drain_timeout
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+
+    def build_app(self, path: str = "/webhook") -> web.Application:
+        app = web.Application()
+        app.router.add_post(path, self.handle)
+        app.on_shutdown.append(self._on_shutdown)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not secrets.compare_digest(
+            request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), self.secret_token
+        ):
+            return web.Response(status=401)
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        await self._slots.acquire()
+        task = asyncio.create_task(self._process(data))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    async def _process(self, data: dict) -> None:
+        try:
+            await self.feed(data)
+        except Exception as e:
+            logging.exception(f"Error processing webhook update {data.get('update_id')}: {e}")
+        finally:
+            self._slots.release()
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    async def _on_shutdown(self, app: web.Application) -> None:
+        if not self._tasks:
+            return
+        logging.info(f"Draining {len(self._tasks)} in-flight updates")
+        done, pending = await asyncio.wait(set(self._tasks), timeout=self.drain_timeout)
+        if pending:
+            logging.warning(f"{len(pending)} updates still running after drain timeout, cancelling")
+            for task in pending:
+                task.cancel()
+
+async def run_webhook(dp: Optional[Dispatcher], bot: Bot, allowed_updates: List[str],
+                      feed: Optional[Callable[[dict], Awaitable]] = None) -> None:
+    """Serve updates over a webhook until SIGINT/SIGTERM."""
+    # Telegram echoes the secret in a header; a fresh random one when none is configured
+    secret = config.WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    server = WebhookServer(dp, bot, secret, config.WEBHOOK_CONCURRENCY, config.WEBHOOK_DRAIN_TIMEOUT, feed)
+    registry.gauge("bot_webhook_in_flight", "Webhook updates acknowledged but still being handled", server.in_flight)
+    runner = web.AppRunner(server.build_app(config.WEBHOOK_PATH))
+    await runner.setup()
+    site = web.TCPSite(runner, config.WEBHOOK_HOST, config.WEBHOOK_PORT)
+    await site.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+    try:
+        await bot.set_webhook(
+            url=config.WEBHOOK_URL.rstrip("/") + config.WEBHOOK_PATH,
+            secret_token=secret,
+            allowed_updates=allowed_updates,
+            max_connections=min(100, config.WEBHOOK_CONCURRENCY),
+        )
+        logging.info(f"Webhook listening on {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}")
+        await stop.wait()
+    finally:
+        # Stops accepting requests, then drains in-flight updates
+        await runner.cleanup()
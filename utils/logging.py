@@ -1,18 +1,115 @@
+import atexit
+import gzip
+import json
 import logging
+import os
+import shutil
 import sys
-from typing import Optional
-
-def setup_logging(debug: bool = False) -> None:
-    level = logging.DEBUG if debug else logging.INFO
-    logging.basicConfig(
-        level=level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler('bot.log', encoding='utf-8')
-        ]
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from queue import SimpleQueue
+from typing import List, Optional
+from config import config
+
+# Log calls only enqueue the record; a background listener thread formats it
+# and does the file/stdout I/O, so logging never blocks the event loop.
+_handlers: List[logging.Handler] = []
+_listeners: List[QueueListener] = []
+
+class _LocalQueueHandler(QueueHandler):
+    # Same-process queue: hand over the record as is and leave all
+    # formatting (including msg % args and tracebacks) to the listener
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.processName,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+def _gzip_namer(name: str) -> str:
+    return name + ".gz"
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+def _build_handlers() -> List[logging.Handler]:
+    if config.LOG_ROTATE_WHEN:
+        file_handler = TimedRotatingFileHandler(
+            config.LOG_FILE, when=config.LOG_ROTATE_WHEN, backupCount=config.LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    else:
+        file_handler = RotatingFileHandler(
+            config.LOG_FILE, maxBytes=config.LOG_MAX_BYTES, backupCount=config.LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    # Rotated files are gzipped on the listener thread
+    file_handler.namer = _gzip_namer
+    file_handler.rotator = _gzip_rotator
+
+    formatter = JsonFormatter() if config.LOG_JSON else logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
+    handlers = [logging.StreamHandler(sys.stdout), file_handler]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+def setup_logging(debug: bool = False, queue=None) -> None:
+    """Route all logging through a queue.
+
+    Sharded workers pass the multiprocessing `queue` shared with the front
+    process, which writes their records alongside its own (see serve_queue).
+    """
+    root = logging.getLogger()
+    root.setLevel(logging.DEBUG if debug else logging.INFO)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    if queue is not None:
+        # Only the front process writes the log file; drop any listener and
+        # file handlers this process may have set up already
+        stop_logging()
+        for handler in _handlers:
+            handler.close()
+        _handlers.clear()
+        # Records cross a process boundary, so they must be formatted/picklable
+        root.addHandler(QueueHandler(queue))
+    else:
+        _handlers[:] = _build_handlers()
+        local_queue: SimpleQueue = SimpleQueue()
+        _start_listener(local_queue)
+        root.addHandler(_LocalQueueHandler(local_queue))
+        atexit.register(stop_logging)
 
     # Suppress noisy logs from libraries
     logging.getLogger('aiosqlite').setLevel(logging.WARNING)
     logging.getLogger('aiogram').setLevel(logging.WARNING)
+
+def _start_listener(queue) -> None:
+    listener = QueueListener(queue, *_handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+
+def serve_queue(queue) -> None:
+    """Also write records that other processes put on `queue`."""
+    _start_listener(queue)
+
+def stop_logging(queue: Optional[object] = None) -> None:
+    """Flush and stop the listener threads (all of them, or the one serving `queue`)."""
+    for listener in list(_listeners):
+        if queue is None or listener.queue is queue:
+            listener.stop()
+            _listeners.remove(listener)
@@ -0,0 +1,142 @@
+import functools
+import time
+from bisect import bisect_left
+from typing import Awaitable, Callable, Dict, List, Sequence, TypeVar, Union
+
+T = TypeVar("T")
+
+# Minimal Prometheus text-format metrics. Every metric has at most one label,
+# which is all the bot needs (handler, repository function, API method), and
+# recording is a dict lookup plus an addition so it can sit on hot paths.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(label: str, value: str, extra: str = "") -> str:
+    parts = []
+    if label:
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{label}="{escaped}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, label: str = ""):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._values: Dict[str, float] = {}
+
+    def inc(self, label_value: str = "", by: float = 1) -> None:
+        self._values[label_value] = self._values.get(label_value, 0) + by
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.label, v)} {n}" for v, n in self._values.items()]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, label: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        # label value -> [per-bucket counts (last is +Inf), sum]
+        self._values: Dict[str, list] = {}
+
+    def observe(self, label_value: str, value: float) -> None:
+        entry = self._values.get(label_value)
+        if entry is None:
+            entry = self._values[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def count(self, label_value: str = "") -> int:
+        entry = self._values.get(label_value)
+        return sum(entry[0]) if entry else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for value, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _labels(self.label, value, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label, value)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label, value)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time from a callback returning a number or {label value: number}."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, read: Callable[[], Union[float, Dict[str, float]]], label: str = ""):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.read = read
+
+    def samples(self) -> List[str]:
+        value = self.read()
+        if isinstance(value, dict):
+            return [f"{self.name}{_labels(self.label, k)} {v}" for k, v in value.items()]
+        return [f"{self.name} {value}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, help: str, label: str = "") -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help, label))
+
+    def histogram(self, name: str, help: str, label: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help, label, buckets))
+
+    def gauge(self, name: str, help: str, read: Callable, label: str = "") -> Gauge:
+        # Re-registering replaces the callback (e.g. a new webhook server)
+        gauge = self._metrics[name] = Gauge(name, help, read, label)
+        return gauge
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                samples = metric.samples()
+            except Exception:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def timed(histogram: Histogram, errors: Counter) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """Decorator recording an async function's latency and failures under its name."""
+    def decorate(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except Exception:
+                errors.inc(name)
+                raise
+            finally:
+                histogram.observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
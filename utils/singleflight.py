@@ -0,0 +1,27 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one in-flight call.
+
+    Callers that arrive while a call for their key is running await its
+    result instead of starting their own. A caller being cancelled does not
+    cancel the shared call.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        fut = self._calls.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(fn())
+            self._calls[key] = fut
+            fut.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(fut)
+
+    def __len__(self) -> int:
+        return len(self._calls)